@@ -1,50 +1,53 @@
 import boto3
 from openai import OpenAI
-import json
-import tiktoken
-from io import BytesIO
+import hashlib
+import itertools
+import threading
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, ClientError
-from pdfminer.high_level import extract_text
 import os
 import sys
 from dotenv import load_dotenv
+from backoff import call_with_retries
+from chunker import MAX_TOKENS, chunk_document, chunk_stream, get_tokenizer
+from llm_cache import cached_completion
+from pdf_extract import extract_pages_parallel, spool_to_file
+from index_store import open_index_store
+from retrieval_index import build_retrieval_index
 
 # 🧱 Safe console encoding for Windows
 #sys.stdout = sys.__stdout__ = open(sys.stdout.fileno(), mode='w', encoding='utf-8', buffering=1)
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-tokenizer = tiktoken.encoding_for_model("gpt-4o")
-MAX_TOKENS = 8000
 SUPPORTED_EXTENSIONS = ('.txt', '.md', '.csv', '.log', '.pdf')
-INDEX_FILE = "s3_file_index.json"
+
+# Pipeline stage limits: concurrent S3 downloads, PDF extraction processes,
+# concurrent OpenAI summarization calls and documents in flight (backpressure)
+FETCH_CONCURRENCY = int(os.getenv("INDEX_FETCH_CONCURRENCY", "16"))
+EXTRACT_WORKERS = int(os.getenv("INDEX_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+SUMMARIZE_CONCURRENCY = int(os.getenv("INDEX_SUMMARIZE_CONCURRENCY", "8"))
+MAX_IN_FLIGHT = int(os.getenv("INDEX_MAX_IN_FLIGHT", "32"))
+
+# The client and the tokenizer are built on first use, so importing this module stays cheap
+@lru_cache(maxsize=None)
+def get_client():
+    # Retries are handled by call_with_retries so that backoff is jittered across workers
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
 
 def num_tokens(text):
-    return len(tokenizer.encode(text))
+    return len(get_tokenizer().encode(text))
 
 def chunk_text(text, max_tokens=MAX_TOKENS):
-    words = text.split()
-    chunks, chunk, tokens = [], [], 0
-
-    for word in words:
-        word_tokens = num_tokens(word + ' ')
-        if tokens + word_tokens > max_tokens:
-            chunks.append(' '.join(chunk))
-            chunk = [word]
-            tokens = word_tokens
-        else:
-            chunk.append(word)
-            tokens += word_tokens
-
-    if chunk:
-        chunks.append(' '.join(chunk))
-    return chunks
+    return [chunk.text for chunk in chunk_document(text, max_tokens=max_tokens, tokenizer=get_tokenizer())]
 
 def analyze_chunk_with_gpt(text_chunk):
     try:
-        response = client.chat.completions.create(
+        return call_with_retries(
+            cached_completion,
+            get_client(),
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are an assistant that indexes files by extracting title, topics, keywords and summary."},
@@ -52,87 +55,200 @@ def analyze_chunk_with_gpt(text_chunk):
             ],
             temperature=0.2
         )
-        return response.choices[0].message.content
     except Exception as e:
-        print(f"[OpenAI API error] {e}")
+        print(f"[OpenAI API error] {e}", file=sys.stderr)
         return None
 
-def load_existing_index():
-    if os.path.exists(INDEX_FILE):
-        try:
-            with open(INDEX_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-    return {}
-
-def save_index(index):
-    with open(INDEX_FILE, "w", encoding="utf-8") as f:
-        json.dump(index, f, indent=2, ensure_ascii=False)
-
-def index_s3_text_files(bucket_name, aws_access_key, aws_secret_key, region_name, prefix):
+def object_fingerprint(obj):
+    """ETag, size and LastModified of a list_objects_v2 entry, used to detect unchanged objects."""
+    last_modified = obj.get('LastModified')
+    return {
+        "etag": obj.get('ETag', '').strip('"'),
+        "size": obj.get('Size'),
+        "last_modified": last_modified.isoformat() if hasattr(last_modified, 'isoformat') else last_modified
+    }
+
+def is_unchanged(entry, fingerprint):
+    return entry is not None and all(entry.get(field) == value for field, value in fingerprint.items())
+
+def chunk_hash(chunk):
+    return hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+
+def index_s3_text_files(bucket_name, aws_access_key, aws_secret_key, region_name, prefix,
+                        fetch_concurrency=FETCH_CONCURRENCY, extract_workers=EXTRACT_WORKERS,
+                        summarize_concurrency=SUMMARIZE_CONCURRENCY, max_in_flight=MAX_IN_FLIGHT,
+                        progress=None):
+    """
+    Index S3 text/PDF files as a staged pipeline: threaded S3 downloads, a process pool
+    for PDF text extraction and a bounded thread pool for GPT summarization. At most
+    max_in_flight documents are being processed at once, so the listing only advances
+    as fast as the slower stages drain.
+
+    Indexing is incremental: objects whose ETag, size and LastModified match the index
+    are skipped from the listing alone, keys no longer under the prefix are pruned, and
+    only chunks whose content hash is new are sent for summarization.
+
+    progress, if given, is called as progress(documents_done, documents_total) from worker
+    threads; the total is None until the listing has finished.
+    """
     s3 = boto3.client(
         's3',
         aws_access_key_id=aws_access_key,
         aws_secret_access_key=aws_secret_key,
-        region_name=region_name
+        region_name=region_name,
+        config=Config(max_pool_connections=max(fetch_concurrency, 10))
     )
 
-    existing_index = load_existing_index()
-    updated_index = {}
-
-    paginator = s3.get_paginator('list_objects_v2')
-    operation_parameters = {'Bucket': bucket_name, 'Prefix': prefix}
-
-    for page in paginator.paginate(**operation_parameters):
-        for obj in page.get('Contents', []):
-            key = obj['Key']
-            if not key.lower().endswith(SUPPORTED_EXTENSIONS):
-                print(f"[Skipped] Unsupported file: {key}")
-                continue
-
-            try:
+    # The store is closed however the run ends, including failed listings and index builds
+    with open_index_store() as store:
+        existing_files = store.file_states()
+        listed_keys = set()
+        updated_keys = []
+        fetch_slots = threading.BoundedSemaphore(fetch_concurrency)
+        in_flight = threading.BoundedSemaphore(max_in_flight)
+        # Chunk texts queued for summarization, so a slow API does not pile documents up in memory
+        summarize_slots = threading.BoundedSemaphore(2 * summarize_concurrency)
+        documents_done = itertools.count(1)
+        documents_total = None
+
+        def fetch_object(key):
+            with fetch_slots:
                 response = s3.get_object(Bucket=bucket_name, Key=key)
-                raw_data = response['Body'].read()
+                return response['Body'].read()
 
+        def spool_object(key):
+            # PDFs are streamed to a temporary file rather than read into memory
+            with fetch_slots:
+                response = s3.get_object(Bucket=bucket_name, Key=key)
+                return spool_to_file(response['Body'])
+
+        def read_chunks(key, spooled):
+            if spooled is not None:
+                # Pages are extracted by the process pool and chunked as they arrive
+                return chunk_stream(extract_pages_parallel(spooled, extract_pool),
+                                    max_tokens=MAX_TOKENS, tokenizer=get_tokenizer())
+            content = call_with_retries(fetch_object, key).decode('utf-8', errors='ignore')
+            return chunk_document(content, max_tokens=MAX_TOKENS, tokenizer=get_tokenizer())
+
+        def summarize(digest, text):
+            """The stored summary for a known chunk, otherwise a future for a fresh one."""
+            known = store.summaries_for_hashes([digest])
+            if digest in known:
+                return known[digest]
+            summarize_slots.acquire()
+            future = summarize_pool.submit(analyze_chunk_with_gpt, text)
+            future.add_done_callback(lambda _: summarize_slots.release())
+            return future
+
+        def process_object(key, fingerprint):
+            spooled = None
+            try:
                 if key.lower().endswith('.pdf'):
-                    content = extract_text(BytesIO(raw_data))
+                    spooled = call_with_retries(spool_object, key)
+                previous = existing_files.get(key, {})
+                # An entry from before content hashing keeps its summaries if the chunk count matches,
+                # which is only known once the document has been read
+                legacy = bool(previous) and not previous["hashed"]
+
+                # Each chunk is hashed and handed to the summarize pool as it arrives, then dropped;
+                # leading whitespace-only chunks wait until the document turns out to have text
+                chunk_hashes, chunk_tokens, summaries = [], [], []
+                blank = {}
+                readable = False
+                for chunk in read_chunks(key, spooled):
+                    chunk_hashes.append(chunk_hash(chunk.text))
+                    chunk_tokens.append(chunk.token_count)
+                    readable = readable or bool(chunk.text.strip())
+                    if legacy:
+                        continue
+                    if not readable:
+                        blank[len(summaries)] = chunk.text
+                        summaries.append(None)
+                        continue
+                    for i, text in blank.items():
+                        summaries[i] = summarize(chunk_hashes[i], text)
+                    blank = {}
+                    summaries.append(summarize(chunk_hashes[-1], chunk.text))
+                chunk_count = len(chunk_hashes)
+
+                if not readable:
+                    print(f"[Skipped] Empty or unreadable: {key}", file=sys.stderr)
+                    return
+
+                if legacy and previous["chunks"] == chunk_count:
+                    # Entry from before content hashing: keep its summaries, record the hashes
+                    print(f"[Cached] Upgrading index entry without re-summarizing: {key}", file=sys.stderr)
+                    summaries = store.get_file(key)["summaries"]
                 else:
-                    content = raw_data.decode('utf-8', errors='ignore')
-
-                if not content.strip():
-                    print(f"[Skipped] Empty or unreadable: {key}")
-                    continue
-
-                chunks = chunk_text(content)
-                chunk_count = len(chunks)
-
-                if key in existing_index and existing_index[key].get("chunks") == chunk_count:
-                    print(f"[Cached] Skipping already indexed file: {key}")
-                    continue
-
-                print(f"[Processing] {key} ({chunk_count} chunks)")
-                summaries = []
-                for i, chunk in enumerate(chunks):
-                    print(f" - Chunk {i+1}/{chunk_count}")
-                    summary = analyze_chunk_with_gpt(chunk)
-                    summaries.append(summary or "[Error] GPT returned nothing")
-
-                updated_index[key] = {
+                    if legacy:
+                        # The chunking changed, so the document is read again to summarize its chunks
+                        summaries = [summarize(chunk_hash(chunk.text), chunk.text) for chunk in read_chunks(key, spooled)]
+                    changed = sum(isinstance(summary, Future) for summary in summaries)
+                    print(f"[Processing] {key} ({chunk_count} chunks, {changed} changed)", file=sys.stderr)
+                    summaries = [
+                        (summary.result() if isinstance(summary, Future) else summary) or "[Error] GPT returned nothing"
+                        for summary in summaries
+                    ]
+
+                # Each file is committed as soon as it is done, so an interrupted run keeps its progress
+                store.upsert_file(key, {
+                    **fingerprint,
                     "chunks": chunk_count,
+                    "chunk_hashes": chunk_hashes,
+                    "chunk_tokens": chunk_tokens,
                     "summaries": summaries
-                }
+                })
+                updated_keys.append(key)
 
             except (NoCredentialsError, ClientError) as e:
-                print(f"[AWS Error] {key}: {e}")
+                print(f"[AWS Error] {key}: {e}", file=sys.stderr)
             except Exception as e:
-                print(f"[Error] {key}: {e}")
-
-    if updated_index:
-        existing_index.update(updated_index)
-        save_index(existing_index)
-        print(f"[Done] Indexed {len(updated_index)} new document(s)")
-    else:
-        print("[Info] No new documents indexed.")
+                print(f"[Error] {key}: {e}", file=sys.stderr)
+            finally:
+                if spooled is not None:
+                    os.remove(spooled)
+                in_flight.release()
+                if progress is not None:
+                    progress(next(documents_done), documents_total)
+
+        paginator = s3.get_paginator('list_objects_v2')
+        operation_parameters = {'Bucket': bucket_name, 'Prefix': prefix}
+
+        submitted = 0
+
+        # The document pool is entered last so it drains before the stage pools shut down
+        with ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+                ThreadPoolExecutor(max_workers=summarize_concurrency, thread_name_prefix="index-gpt") as summarize_pool, \
+                ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="index-doc") as doc_pool:
+            for page in paginator.paginate(**operation_parameters):
+                for obj in page.get('Contents', []):
+                    key = obj['Key']
+                    if not key.lower().endswith(SUPPORTED_EXTENSIONS):
+                        print(f"[Skipped] Unsupported file: {key}", file=sys.stderr)
+                        continue
+
+                    listed_keys.add(key)
+                    fingerprint = object_fingerprint(obj)
+                    if is_unchanged(existing_files.get(key), fingerprint):
+                        print(f"[Cached] Unchanged since last index: {key}", file=sys.stderr)
+                        continue
+
+                    in_flight.acquire()
+                    submitted += 1
+                    doc_pool.submit(process_object, key, fingerprint)
+
+            documents_total = submitted
+
+        # The listing completed, so anything under the prefix that was not listed was deleted
+        deleted_keys = [key for key in existing_files if key.startswith(prefix or '') and key not in listed_keys]
+        for key in deleted_keys:
+            print(f"[Pruned] Removed from bucket: {key}", file=sys.stderr)
+        store.delete_files(deleted_keys)
+
+        if updated_keys or deleted_keys:
+            build_retrieval_index(store)
+            print(f"[Done] Indexed {len(updated_keys)} new or changed document(s), pruned {len(deleted_keys)}", file=sys.stderr)
+        else:
+            print("[Info] No new documents indexed.", file=sys.stderr)
 
-    return existing_index
+        return {"indexed": len(updated_keys), "pruned": len(deleted_keys), "total": store.count_files()}
@@ -0,0 +1,62 @@
+import os
+import random
+import sys
+import time
+
+MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "5"))
+BASE_DELAY = float(os.getenv("API_RETRY_BASE_DELAY", "1.0"))
+MAX_DELAY = float(os.getenv("API_RETRY_MAX_DELAY", "30.0"))
+
+# AWS error codes that are worth retrying even when no HTTP status is attached
+RETRYABLE_AWS_CODES = {
+    "SlowDown", "Throttling", "ThrottlingException", "RequestTimeout",
+    "RequestLimitExceeded", "InternalError", "ServiceUnavailable",
+}
+# Transport-level errors from openai/httpx/botocore
+RETRYABLE_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "EndpointConnectionError",
+    "ConnectTimeoutError", "ReadTimeoutError", "ConnectionClosedError",
+}
+
+
+def status_code_of(exc):
+    """HTTP status of an OpenAI/Anthropic APIStatusError or a botocore ClientError, if any."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        if isinstance(response, dict):
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return status
+
+
+def is_retryable(exc):
+    """True for rate limiting (429), server errors (5xx) and transient connection failures."""
+    status = status_code_of(exc)
+    if status is not None and (status == 429 or status >= 500):
+        return True
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict) and response.get("Error", {}).get("Code") in RETRYABLE_AWS_CODES:
+        return True
+    return type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def backoff_delay(attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_retries(fn, *args, retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY, **kwargs):
+    """
+    Call fn(*args, **kwargs), retrying retryable errors with jittered exponential backoff.
+    Non-retryable errors and the last failure are re-raised.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"[Retry] {type(e).__name__} (status {status_code_of(e)}), "
+                  f"attempt {attempt + 1}/{retries}, sleeping {delay:.1f}s", file=sys.stderr)
+            time.sleep(delay)
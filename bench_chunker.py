@@ -0,0 +1,82 @@
+"""
+Micro-benchmark: per-word tiktoken chunking (the original aws_file_index.chunk_text)
+against the single-encode token-window chunker on ~1 MB of text.
+
+    python bench_chunker.py [--size-mb 1] [--max-tokens 8000] [--overlap 0] [--snap sentence]
+"""
+import argparse
+import random
+import time
+
+from chunker import chunk_document, get_tokenizer
+
+WORDS = (
+    "aircraft engine failure runway approach crew checklist hydraulic pressure altitude "
+    "descent turbulence maintenance inspection fuel pump warning cockpit tower clearance "
+    "landing gear incident report investigation cause factor fatigue procedure deviation"
+).split()
+
+
+def legacy_chunk_text(text, tokenizer, max_tokens):
+    words = text.split()
+    chunks, chunk, tokens = [], [], 0
+
+    for word in words:
+        word_tokens = len(tokenizer.encode(word + ' '))
+        if tokens + word_tokens > max_tokens:
+            chunks.append(' '.join(chunk))
+            chunk = [word]
+            tokens = word_tokens
+        else:
+            chunk.append(word)
+            tokens += word_tokens
+
+    if chunk:
+        chunks.append(' '.join(chunk))
+    return chunks
+
+
+def synthetic_text(size_bytes, seed=0):
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < size_bytes:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+        if rng.random() < 0.15:
+            sentence += "\n\n"
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=1.0)
+    parser.add_argument("--max-tokens", type=int, default=8000)
+    parser.add_argument("--overlap", type=int, default=0)
+    parser.add_argument("--snap", choices=["none", "sentence", "paragraph"], default="sentence")
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer()
+    text = synthetic_text(int(args.size_mb * 1024 * 1024))
+    print(f"Text: {len(text):,} chars, {len(tokenizer.encode(text)):,} tokens")
+
+    legacy, legacy_time = timed(lambda: legacy_chunk_text(text, tokenizer, args.max_tokens))
+    chunks, new_time = timed(lambda: chunk_document(
+        text, max_tokens=args.max_tokens, overlap=args.overlap, snap=args.snap, tokenizer=tokenizer))
+
+    legacy_max = max(len(tokenizer.encode(c)) for c in legacy)
+    new_max = max(c.token_count for c in chunks)
+    print(f"legacy per-word : {legacy_time:8.3f}s  {len(legacy):4d} chunks  max {legacy_max} tokens (re-encoded)")
+    print(f"token windows   : {new_time:8.3f}s  {len(chunks):4d} chunks  max {new_max} tokens (exact)")
+    print(f"speedup         : {legacy_time / new_time:8.1f}x")
+    assert new_max <= args.max_tokens
+
+
+if __name__ == "__main__":
+    main()
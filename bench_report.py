@@ -0,0 +1,165 @@
+"""
+Benchmark: the original per-section sales report queries against report.compute_report_data on a
+synthetic online_sales database (10M order_items rows by default).
+
+    python bench_report.py [--db bench_sales.db] [--order-items 10000000] [--orders 2000000]
+                           [--customers 200000] [--products 5000] [--rebuild] [--repeat 1]
+
+The database is generated inside SQLite with recursive CTEs and kept between runs; pass
+--rebuild to regenerate it. The legacy queries run through pandas when it is installed.
+--aggregates also installs sales_aggregates and times the report read from them.
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+from database_creation import create_indexes, create_schema
+from report import compute_report_data, format_report
+from sales_aggregates import aggregates_installed, install_aggregates
+
+# The statements the original report ran, one read_sql_query round trip each
+LEGACY_QUERIES = [
+    "SELECT COUNT(*) as order_count, SUM(total_amount) as total_revenue FROM orders",
+    """SELECT status, COUNT(*) as count, SUM(total_amount) as total_amount,
+       ROUND(AVG(total_amount), 2) as avg_amount
+       FROM orders GROUP BY status ORDER BY count DESC""",
+    """SELECT category, COUNT(*) as product_count
+       FROM products GROUP BY category ORDER BY product_count DESC""",
+    """SELECT p.name, p.category, p.price, SUM(oi.quantity) as units_sold,
+              SUM(oi.quantity * oi.price_per_unit) as revenue
+       FROM products p JOIN order_items oi ON p.product_id = oi.product_id
+       GROUP BY p.product_id ORDER BY revenue DESC LIMIT 5""",
+    """SELECT p.category, SUM(oi.quantity) as units_sold, SUM(oi.quantity * oi.price_per_unit) as revenue
+       FROM order_items oi JOIN products p ON oi.product_id = p.product_id
+       GROUP BY p.category ORDER BY revenue DESC""",
+    "SELECT COUNT(*) as count FROM customers",
+    """SELECT c.first_name || ' ' || c.last_name as customer_name, COUNT(o.order_id) as order_count,
+              SUM(o.total_amount) as total_spent, AVG(o.total_amount) as avg_order_value
+       FROM customers c JOIN orders o ON c.customer_id = o.customer_id
+       GROUP BY c.customer_id ORDER BY total_spent DESC LIMIT 5""",
+    "SELECT state, COUNT(*) as customer_count FROM customers GROUP BY state ORDER BY customer_count DESC",
+    """SELECT SUM(stock_quantity) as total_units, AVG(stock_quantity) as avg_stock,
+              MIN(stock_quantity) as min_stock, MAX(stock_quantity) as max_stock FROM products""",
+    """SELECT name, category, stock_quantity, price FROM products
+       WHERE stock_quantity < 50 ORDER BY stock_quantity ASC""",
+    """SELECT payment_method, COUNT(*) as order_count, SUM(total_amount) as total_revenue,
+              AVG(total_amount) as avg_order_value
+       FROM orders GROUP BY payment_method ORDER BY total_revenue DESC""",
+]
+
+SERIES = "WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < :n) "
+
+
+def build_database(path, customers, products, orders, order_items):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    # Indexes are built once after the bulk load rather than maintained row by row
+    create_schema(conn.cursor(), indexes=False)
+    with conn:
+        conn.execute(SERIES + """
+            INSERT INTO customers (customer_id, first_name, last_name, email, address, city, state,
+                                   zipcode, registration_date)
+            SELECT x, 'First' || x, 'Last' || x, 'user' || x || '@example.com', x || ' Main St', 'City',
+                   substr('NYCAILTXAZWAFLGAOHPAMI', 1 + 2 * (abs(random()) % 11), 2),
+                   printf('%05d', abs(random()) % 100000), '2023-01-01'
+            FROM seq""", {"n": customers})
+        conn.execute(SERIES + """
+            INSERT INTO products (product_id, name, category, price, stock_quantity, created_date)
+            SELECT x, 'Product ' || x,
+                   CASE abs(random()) % 6 WHEN 0 THEN 'Electronics' WHEN 1 THEN 'Clothing'
+                        WHEN 2 THEN 'Kitchen' WHEN 3 THEN 'Sports' WHEN 4 THEN 'Footwear' ELSE 'Books' END,
+                   round(5 + (abs(random()) % 200000) / 100.0, 2), abs(random()) % 500, '2023-01-01'
+            FROM seq""", {"n": products})
+        conn.execute(SERIES + """
+            INSERT INTO orders (order_id, customer_id, order_date, total_amount, status, shipping_address,
+                                payment_method)
+            SELECT x, 1 + abs(random()) % :customers, '2024-01-01', round((abs(random()) % 500000) / 100.0, 2),
+                   CASE abs(random()) % 4 WHEN 0 THEN 'Pending' WHEN 1 THEN 'Shipped'
+                        WHEN 2 THEN 'Delivered' ELSE 'Cancelled' END,
+                   'Somewhere',
+                   CASE abs(random()) % 4 WHEN 0 THEN 'Credit Card' WHEN 1 THEN 'PayPal'
+                        WHEN 2 THEN 'Apple Pay' ELSE 'Google Pay' END
+            FROM seq""", {"n": orders, "customers": customers})
+        conn.execute(SERIES + """
+            INSERT INTO order_items (order_item_id, order_id, product_id, quantity, price_per_unit)
+            SELECT x, 1 + abs(random()) % :orders, 1 + abs(random()) % :products, 1 + abs(random()) % 3,
+                   round(5 + (abs(random()) % 200000) / 100.0, 2)
+            FROM seq""", {"n": order_items, "orders": orders, "products": products})
+    create_indexes(conn.cursor())
+    conn.close()
+
+
+def run_legacy(path):
+    conn = sqlite3.connect(path)
+    try:
+        try:
+            import pandas as pd
+        except ImportError:
+            for query in LEGACY_QUERIES:
+                conn.execute(query).fetchall()
+        else:
+            for query in LEGACY_QUERIES:
+                pd.read_sql_query(query, conn)
+    finally:
+        conn.close()
+
+
+def run_engine(path, use_aggregates=False):
+    conn = sqlite3.connect(path)
+    try:
+        return format_report(compute_report_data(conn, use_aggregates=use_aggregates))
+    finally:
+        conn.close()
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench_sales.db")
+    parser.add_argument("--order-items", type=int, default=10_000_000)
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--aggregates", action="store_true")
+    args = parser.parse_args()
+
+    if args.rebuild or not os.path.exists(args.db):
+        print(f"[Bench] Generating {args.order_items:,} order_items rows in {args.db}...")
+        start = time.perf_counter()
+        build_database(args.db, args.customers, args.products, args.orders, args.order_items)
+        print(f"[Bench] Generated in {time.perf_counter() - start:.1f}s")
+
+    legacy = timed(lambda: run_legacy(args.db), args.repeat)
+    engine = timed(lambda: run_engine(args.db), args.repeat)
+    print(f"legacy ({len(LEGACY_QUERIES)} queries): {legacy:.2f}s")
+    print(f"engine (4 statements):    {engine:.2f}s  ({legacy / engine:.1f}x)")
+
+    if args.aggregates:
+        conn = sqlite3.connect(args.db)
+        try:
+            if not aggregates_installed(conn):
+                start = time.perf_counter()
+                install_aggregates(conn)
+                print(f"[Bench] Installed aggregates in {time.perf_counter() - start:.1f}s")
+        finally:
+            conn.close()
+        aggregated = timed(lambda: run_engine(args.db, use_aggregates=True), args.repeat)
+        print(f"engine (aggregates):      {aggregated:.3f}s  ({legacy / aggregated:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
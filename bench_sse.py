@@ -0,0 +1,137 @@
+"""
+Load test for mcp_server.py over SSE: drives concurrent MCP client sessions against one
+warm server (or several workers) and reports p50/p99 latency per tool.
+
+    python bench_sse.py --spawn [--workers 1] [--sessions 20] [--calls 10] [--tools get-datetime,get-salereport]
+    python bench_sse.py --url http://127.0.0.1:8000/sse [--url http://127.0.0.1:8001/sse] [--sessions 20]
+
+--spawn starts `mcp_server.py --transport sse` itself on --port (workers on consecutive
+ports) and stops it afterwards; otherwise the --url servers must already be running.
+Sessions are spread round-robin over the workers. Each session connects, then makes
+--calls rounds of one call per tool.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py")
+
+# Tools exercised by default, with their arguments; these only need the sales database
+DEFAULT_CALLS = {
+    "get-datetime": {},
+    "get-salereport": {},
+    "get-database_schema": {},
+    "get-database_data": {"table": "orders", "limit": 100},
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+async def run_session(url, calls, rounds, latencies, errors):
+    start = time.perf_counter()
+    async with sse_client(url) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            latencies["(connect)"].append(time.perf_counter() - start)
+            for _ in range(rounds):
+                for name, arguments in calls.items():
+                    start = time.perf_counter()
+                    try:
+                        result = await session.call_tool(name, arguments)
+                        failed = result.isError
+                    except Exception:
+                        failed = True
+                    latencies[name].append(time.perf_counter() - start)
+                    errors[name] += failed
+
+
+async def load_test(urls, calls, sessions, rounds):
+    latencies, errors = defaultdict(list), defaultdict(int)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_session(urls[i % len(urls)], calls, rounds, latencies, errors) for i in range(sessions)
+    ), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failed_sessions = [result for result in results if isinstance(result, BaseException)]
+    return latencies, errors, failed_sessions, elapsed
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on {host}:{port} did not start within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", help="SSE endpoint of a running server (repeat for workers)")
+    parser.add_argument("--spawn", action="store_true", help="start mcp_server.py --transport sse for the run")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=10, help="rounds of calls per session")
+    parser.add_argument("--tools", default=",".join(DEFAULT_CALLS), help="comma-separated tools to call")
+    args = parser.parse_args()
+
+    calls = {name: DEFAULT_CALLS.get(name, {}) for name in args.tools.split(",") if name}
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, SERVER_SCRIPT, "--transport", "sse", "--host", args.host,
+                                   "--port", str(args.port), "--workers", str(args.workers)])
+        urls = [f"http://{args.host}:{args.port + i}/sse" for i in range(args.workers)]
+    elif args.url:
+        urls = args.url
+    else:
+        parser.error("pass --url for a running server or --spawn")
+
+    try:
+        if server is not None:
+            for i in range(args.workers):
+                wait_for_port(args.host, args.port + i)
+        print(f"[Load Test] {args.sessions} sessions x {args.calls} rounds of {len(calls)} tool(s) "
+              f"against {len(urls)} server(s)")
+        latencies, errors, failed_sessions, elapsed = asyncio.run(
+            load_test(urls, calls, args.sessions, args.calls))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    total_calls = sum(len(latencies[name]) for name in calls)
+    print(f"{'tool':<22} {'calls':>6} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name in ["(connect)", *calls]:
+        values = latencies.get(name)
+        if not values:
+            continue
+        print(f"{name:<22} {len(values):6d} {errors[name]:6d} {percentile(values, 50) * 1000:8.1f} "
+              f"{percentile(values, 99) * 1000:8.1f} {max(values) * 1000:8.1f}")
+    print(f"[Load Test] {total_calls} calls in {elapsed:.2f}s ({total_calls / elapsed:.0f} calls/s)")
+    for failure in failed_sessions[:5]:
+        print(f"[Load Test] Session failed: {failure!r}")
+    sys.exit(1 if failed_sessions or any(errors.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
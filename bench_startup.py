@@ -0,0 +1,94 @@
+"""
+Startup benchmark for mcp_server.py: spawns the server over stdio the way MCPClient does
+and times the handshake and the first list_tools response, failing when the time to first
+list_tools exceeds the budget.
+
+    python bench_startup.py [--runs 5] [--budget-ms 1500] [--timeout 60] [--no-warm-up]
+    python bench_startup.py --profile [--top 25]
+
+--profile instead imports mcp_server under python -X importtime and lists the modules with
+the largest cumulative import time, to find what the server pulls in before the handshake.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py")
+
+
+def import_profile(module="mcp_server"):
+    """[(cumulative_us, self_us, module)] from python -X importtime, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(SERVER_SCRIPT), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)
+
+
+async def time_startup(warm_up=True):
+    """Seconds from spawning the server to (initialize done, first list_tools response)."""
+    env = {**os.environ, "MCP_WARM_UP": "1" if warm_up else "0"}
+    params = StdioServerParameters(command=sys.executable, args=[SERVER_SCRIPT], env=env)
+    start = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            initialized = time.perf_counter() - start
+            await session.list_tools()
+            listed = time.perf_counter() - start
+    return initialized, listed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for one server start")
+    parser.add_argument("--no-warm-up", action="store_true", help="start the server with MCP_WARM_UP=0")
+    parser.add_argument("--profile", action="store_true", help="print an import-time profile instead")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    if args.profile:
+        rows = import_profile()
+        total = next(cumulative for cumulative, _, name in rows if name == "mcp_server")
+        print(f"[Startup] import mcp_server: {total / 1000:.0f} ms")
+        print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+        for cumulative, self_us, name in rows[:args.top]:
+            print(f"{cumulative / 1000:14.1f} {self_us / 1000:8.1f}  {name}")
+        return
+
+    timings = []
+    for _ in range(args.runs):
+        try:
+            timings.append(asyncio.run(asyncio.wait_for(time_startup(warm_up=not args.no_warm_up), args.timeout)))
+        except asyncio.TimeoutError:
+            print(f"[Startup] No list_tools response after {args.timeout:.0f}s")
+            sys.exit(1)
+    initialized = [t[0] * 1000 for t in timings]
+    listed = [t[1] * 1000 for t in timings]
+    print(f"initialize       : median {statistics.median(initialized):7.0f} ms  max {max(initialized):7.0f} ms")
+    print(f"first list_tools : median {statistics.median(listed):7.0f} ms  max {max(listed):7.0f} ms")
+    print(f"budget           : {args.budget_ms:7.0f} ms")
+    if statistics.median(listed) > args.budget_ms:
+        print("[Startup] Over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
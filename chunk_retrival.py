@@ -1,26 +1,40 @@
-import json
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import sys
+from functools import lru_cache
+from index_cache import index_cache
+from index_store import INDEX_DB, open_index_store
+from llm_cache import cached_completion
+from retrieval_index import load_retrieval_index
 
 load_dotenv()  # load environment variables from .env
 
-# Set your OpenAI API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# The client is built on first use, so importing this module (e.g. in the server warm-up) stays cheap
+@lru_cache(maxsize=None)
+def get_client():
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Path to the index file
-INDEX_PATH = "s3_file_index.json"
+# Path to the index database
+INDEX_PATH = INDEX_DB
+
+# Number of retrieval candidates that are sent to the LLM for scoring and answering
+CANDIDATE_K = int(os.getenv("RETRIEVAL_CANDIDATES", "8"))
 
 def load_index(path=INDEX_PATH):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return open_index_store(path)
+
+def find_relevant_chunks(index_store, query, top_k=3, candidate_k=CANDIDATE_K, retrieval_index=None):
+    # Narrow the corpus locally first, then only ask the LLM about the best candidates
+    if retrieval_index is None:
+        retrieval_index = load_retrieval_index(index_store)
+    hits = retrieval_index.search(query, top_k=max(candidate_k, top_k))
 
-def find_relevant_chunks(index_data, query, top_k=3):
     candidates = []
 
-    for file, data in index_data.items():
-        for i, summary in enumerate(data.get("summaries", [])):
-            prompt = f"""
+    for doc, retrieval_score in hits:
+        file, i, summary = doc["file"], doc["chunk"] - 1, doc["summary"]
+        prompt = f"""
 Please provide a analysis answering for the query below by first find the most relevant content based on their question.
 
 Question: {query}
@@ -33,33 +47,35 @@ Below is a summary of a text chunk:
 Does this chunk seem relevant to the question? If so, return a relevance score between 0 (not relevant) and 10 (very relevant), followed by a one-line explanation.
 
 Respond in this format: Score: <number>, Reason: <short reason>, Anser: <cause analysis answer>
-            """.strip()
+        """.strip()
 
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "You score content relevance to user queries and then use this relevance data to answer the question."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.0
-                )
-                reply = response.choices[0].message.content
-                if "Score:" in reply:
-                    score_line = reply.split("Score:")[1].strip()
-                    #print("score line:",score_line)
-                    score_str, reason, answer = score_line.split(",", 2)
-                    score = float(score_str.strip())
-                    candidates.append({
-                        "file": file,
-                        "chunk": i + 1,
-                        "score": score,
-                        "reason": reason.strip(),
-                        "summary": summary,
-                        "answer": answer
-                    })
-            except Exception as e:
-                print(f"Error scoring chunk from {file}, chunk {i+1}: {e}")
+        try:
+            reply = cached_completion(
+                get_client(),
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": "You score content relevance to user queries and then use this relevance data to answer the question."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.0,
+                similarity_text=query
+            )
+            if "Score:" in reply:
+                score_line = reply.split("Score:")[1].strip()
+                #print("score line:",score_line)
+                score_str, reason, answer = score_line.split(",", 2)
+                score = float(score_str.strip())
+                candidates.append({
+                    "file": file,
+                    "chunk": i + 1,
+                    "score": score,
+                    "retrieval_score": retrieval_score,
+                    "reason": reason.strip(),
+                    "summary": summary,
+                    "answer": answer
+                })
+        except Exception as e:
+            print(f"Error scoring chunk from {file}, chunk {i+1}: {e}", file=sys.stderr)
 
     # Sort and return top results
     sorted_chunks = sorted(candidates, key=lambda x: x["score"], reverse=True)
@@ -67,9 +83,10 @@ Respond in this format: Score: <number>, Reason: <short reason>, Anser: <cause a
 
 # Example usage
 def relevant_chunks_analysis(query):
-    index_data = load_index()
+    # The cache keeps the store and retrieval index in memory until the index changes on disk
+    index_store, retrieval_index = index_cache.get()
     #query = input("Enter your question: ")
-    top_chunks = find_relevant_chunks(index_data, query)
+    top_chunks = find_relevant_chunks(index_store, query, retrieval_index=retrieval_index)
     #print("\nTop Relevant Chunks:")
     output_lines = ["Top Relevant Chunks and the answer:"]
     for result in top_chunks:
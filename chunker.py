@@ -0,0 +1,206 @@
+import os
+from functools import lru_cache
+from typing import NamedTuple
+
+import tiktoken
+
+MAX_TOKENS = 8000
+OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+# "none" cuts at exactly max_tokens, "sentence" or "paragraph" backs off to the nearest boundary
+SNAP = os.getenv("CHUNK_SNAP", "sentence")
+# A snapped chunk keeps at least this fraction of the window, so snapping never produces tiny chunks
+MIN_SNAP_FRACTION = 0.5
+# chunk_stream text waiting for a line break it can be cut at; past this many characters it is cut between words
+PENDING_LIMIT = int(os.getenv("CHUNK_PENDING_LIMIT", "65536"))
+
+SENTENCE_ENDINGS = (b".", b"!", b"?", b'."', b".'", b".)", b":")
+
+
+class Chunk(NamedTuple):
+    text: str
+    token_count: int
+    start_token: int
+    end_token: int
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model="gpt-4o"):
+    return tiktoken.encoding_for_model(model)
+
+
+class _BoundaryClassifier:
+    """
+    Classifies token ids as paragraph/sentence boundaries and as continuations of a
+    multi-byte UTF-8 character, decoding each distinct id once.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.cache = {}
+        self.continuations = {}
+
+    def rank(self, token_id):
+        # 2 = paragraph/line break, 1 = sentence end, 0 = neither
+        rank = self.cache.get(token_id)
+        if rank is None:
+            raw = self.tokenizer.decode_single_token_bytes(token_id).rstrip(b" \t")
+            if raw.endswith(b"\n"):
+                rank = 2
+            elif raw.endswith(SENTENCE_ENDINGS):
+                rank = 1
+            else:
+                rank = 0
+            self.cache[token_id] = rank
+        return rank
+
+    def continues_char(self, token_id):
+        # True when the token starts with a UTF-8 continuation byte, i.e. inside a character
+        continues = self.continuations.get(token_id)
+        if continues is None:
+            raw = self.tokenizer.decode_single_token_bytes(token_id)
+            continues = self.continuations[token_id] = bool(raw) and 0x80 <= raw[0] < 0xC0
+        return continues
+
+
+def _snap_end(tokens, start, end, classifier, snap):
+    """Return a cut position <= end that falls just after a boundary token, or end if none is close."""
+    floor = start + max(1, int((end - start) * MIN_SNAP_FRACTION))
+    wanted = 2 if snap == "paragraph" else 1
+    fallback = None
+    for i in range(end - 1, floor - 1, -1):
+        rank = classifier.rank(tokens[i])
+        if rank >= wanted:
+            return i + 1
+        if rank and fallback is None:
+            fallback = i + 1
+    return fallback or end
+
+
+def _char_boundary(tokens, floor, cut, classifier, fallback):
+    """The largest position in [floor, cut] that is not inside a UTF-8 character, or fallback if there is none."""
+    for i in range(cut, floor - 1, -1):
+        if not classifier.continues_char(tokens[i]):
+            return i
+    return fallback
+
+
+def _window_end(tokens, start, end, classifier, snap):
+    """Move the end of a window that stops before the last token back to a boundary."""
+    if snap != "none":
+        end = _snap_end(tokens, start, end, classifier, snap)
+    return _char_boundary(tokens, start + 1, end, classifier, end)
+
+
+def _next_start(tokens, start, end, overlap, classifier):
+    """Start of the window after tokens[start:end], up to `overlap` tokens back but never inside a character."""
+    return _char_boundary(tokens, start + 1, max(end - overlap, start + 1), classifier, end)
+
+
+def _decode(tokenizer, tokens):
+    # Windows end on character boundaries; "replace" only matters for a character longer than a window
+    return tokenizer.decode_bytes(tokens).decode("utf-8", errors="replace")
+
+
+def chunk_tokens(tokens, tokenizer, max_tokens=MAX_TOKENS, overlap=OVERLAP_TOKENS, snap=SNAP):
+    """
+    Slice an already-encoded token list into windows of at most max_tokens, with
+    `overlap` tokens repeated between consecutive windows. Yields Chunk tuples.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+    if not 0 <= overlap < max_tokens:
+        raise ValueError("overlap must be in [0, max_tokens)")
+
+    classifier = _BoundaryClassifier(tokenizer)
+    total = len(tokens)
+    start = 0
+    while start < total:
+        end = min(start + max_tokens, total)
+        if end < total:
+            end = _window_end(tokens, start, end, classifier, snap)
+        yield Chunk(_decode(tokenizer, tokens[start:end]), end - start, start, end)
+        if end >= total:
+            break
+        start = _next_start(tokens, start, end, overlap, classifier)
+
+
+def chunk_document(text, max_tokens=MAX_TOKENS, overlap=OVERLAP_TOKENS, snap=SNAP, tokenizer=None):
+    """Encode text once and split it into token windows. Returns a list of Chunk tuples."""
+    tokenizer = tokenizer or get_tokenizer()
+    tokens = tokenizer.encode(text, disallowed_special=())
+    return list(chunk_tokens(tokens, tokenizer, max_tokens=max_tokens, overlap=overlap, snap=snap))
+
+
+def _encodable_prefix(text):
+    """
+    Length of the longest prefix of text ending in a line break that is followed by a
+    letter or digit, or 0. The cl100k and o200k pre-tokenizers always split there, so
+    text encoded in pieces cut at such points gives the same tokens as encoding it whole.
+    Punctuation is no safe start: o200k keeps e.g. ".\n/" together as one pre-token.
+    """
+    end = len(text)
+    while True:
+        i = text.rfind("\n", 0, end)
+        if i < 0:
+            return 0
+        if i + 1 < len(text) and text[i + 1].isalnum():
+            return i + 1
+        end = i
+
+
+def _word_prefix(text):
+    """
+    Length of the longest prefix of text ending in a letter or digit that a space follows,
+    or the whole text if there is none. Pre-tokens never span such a point either; only
+    text without one, e.g. a long run of CJK or base64, is cut where it may tokenize
+    differently from encoding it whole.
+    """
+    end = len(text)
+    while True:
+        i = text.rfind(" ", 0, end)
+        if i <= 0:
+            return len(text)
+        if text[i - 1].isalnum():
+            return i
+        end = i
+
+
+def chunk_stream(pieces, max_tokens=MAX_TOKENS, overlap=OVERLAP_TOKENS, snap=SNAP, tokenizer=None,
+                 pending_limit=PENDING_LIMIT):
+    """
+    Chunk text that arrives in pieces (e.g. PDF pages) without holding the whole text.
+    Yields the same Chunk tuples as chunk_document on the joined pieces, each as soon as
+    the tokens after it are known; only the current window, the overlap and the text
+    after the last line break are kept. Text without line breaks is cut between words once
+    it passes pending_limit characters (see _word_prefix).
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+    if not 0 <= overlap < max_tokens:
+        raise ValueError("overlap must be in [0, max_tokens)")
+
+    tokenizer = tokenizer or get_tokenizer()
+    classifier = _BoundaryClassifier(tokenizer)
+    tokens = []  # tokens[0] is token number `offset` of the document, the start of the next window
+    offset = 0
+    pending = ""
+    for piece in pieces:
+        pending += piece
+        cut = _encodable_prefix(pending)
+        if not cut and len(pending) > pending_limit:
+            cut = _word_prefix(pending)
+        if not cut:
+            continue
+        tokens.extend(tokenizer.encode(pending[:cut], disallowed_special=()))
+        pending = pending[cut:]
+        # A window is final once a token past its end is known: its snap only looks back
+        while len(tokens) > max_tokens:
+            end = _window_end(tokens, 0, max_tokens, classifier, snap)
+            yield Chunk(_decode(tokenizer, tokens[:end]), end, offset, offset + end)
+            step = _next_start(tokens, 0, end, overlap, classifier)
+            del tokens[:step]
+            offset += step
+
+    tokens.extend(tokenizer.encode(pending, disallowed_special=()))
+    for chunk in chunk_tokens(tokens, tokenizer, max_tokens=max_tokens, overlap=overlap, snap=snap):
+        yield chunk._replace(start_token=chunk.start_token + offset, end_token=chunk.end_token + offset)
@@ -0,0 +1,83 @@
+import json
+import os
+
+# Prompt tokens allowed per model round, and the most any single tool output may take
+CONTEXT_TOKEN_BUDGET = int(os.getenv("MCP_CONTEXT_TOKEN_BUDGET", "30000"))
+MAX_TOOL_OUTPUT_TOKENS = int(os.getenv("MCP_MAX_TOOL_OUTPUT_TOKENS", "6000"))
+# The most recent tool outputs are never shrunk to fit the budget
+KEEP_RECENT_TOOL_OUTPUTS = int(os.getenv("MCP_KEEP_RECENT_TOOL_OUTPUTS", "2"))
+
+
+def _truncate(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 3 // 4
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n[... {omitted} characters truncated ...]\n{text[-tail:] if tail else ''}"
+
+
+class ContextBudget:
+    """
+    Keeps a tool-use conversation under a prompt token budget.
+
+    Token counts are estimated from character counts, with the characters-per-token
+    ratio calibrated against the input_tokens the API reports after each round. When
+    the estimate is over budget, older tool outputs are truncated first and then
+    replaced by a one-line note; the latest outputs and all other messages are kept.
+    """
+
+    def __init__(self, max_prompt_tokens=CONTEXT_TOKEN_BUDGET, max_tool_output_tokens=MAX_TOOL_OUTPUT_TOKENS,
+                 keep_recent=KEEP_RECENT_TOOL_OUTPUTS):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.keep_recent = keep_recent
+        self.chars_per_token = 4.0
+        self.fixed_chars = 0
+        self.rounds = []
+
+    def set_fixed_context(self, system_prompt, tools):
+        """System prompt and tool definitions are sent every round and count against the budget."""
+        self.fixed_chars = len(system_prompt) + len(json.dumps(tools))
+
+    def _chars(self, messages):
+        return self.fixed_chars + sum(len(m["content"]) for m in messages if isinstance(m.get("content"), str))
+
+    def estimate(self, messages):
+        return int(self._chars(messages) / self.chars_per_token)
+
+    def clip_tool_output(self, text):
+        """Cap a single tool output before it enters the conversation."""
+        return _truncate(text, int(self.max_tool_output_tokens * self.chars_per_token))
+
+    def fit(self, messages, tool_output_indices):
+        """Shrink older tool outputs in place until the conversation fits. Returns the estimate."""
+        shrinkable = tool_output_indices[:-self.keep_recent] if self.keep_recent else list(tool_output_indices)
+        for max_chars in (2000, 0):
+            for i in shrinkable:
+                estimate = self.estimate(messages)
+                if estimate <= self.max_prompt_tokens:
+                    return estimate
+                content = messages[i]["content"]
+                if max_chars:
+                    messages[i]["content"] = _truncate(content, max_chars)
+                else:
+                    first_line = content.split("\n", 1)[0]
+                    messages[i]["content"] = f"{first_line}\n[output removed to stay within the context budget]"
+        return self.estimate(messages)
+
+    def record(self, messages, usage):
+        """Record one round's API usage and recalibrate the token estimate."""
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        if input_tokens:
+            self.chars_per_token = max(1.0, self._chars(messages) / input_tokens)
+        self.rounds.append({"input_tokens": input_tokens, "output_tokens": output_tokens})
+
+    def usage(self):
+        return {
+            "rounds": len(self.rounds),
+            "input_tokens": sum(r["input_tokens"] for r in self.rounds),
+            "output_tokens": sum(r["output_tokens"] for r in self.rounds),
+            "per_round": self.rounds,
+        }
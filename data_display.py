@@ -1,86 +1,243 @@
-import sqlite3
-import pandas as pd
-from tabulate import tabulate
-
-# Function to display schema and table data nicely formatted
-def display_database():
-    # Connect to the database
-    db_path = "online_sales.db"
-    conn = sqlite3.connect(db_path)
+import base64
+import csv
+import io
+import json
+
+from sales_db import SALES_DB_PATH, read_connection
+
+DB_PATH = SALES_DB_PATH
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+FETCH_BATCH = 200
+
+FILTER_OPERATORS = {"=", "!=", "<", "<=", ">", ">=", "like"}
+
+# Read-only summaries that can be paged like tables; "key" is the summary's unique column and,
+# unless "order" lists other ascending SQL expressions (ending in the key), its page order.
+# "aggregate_sql" reads the trigger-maintained sales_aggregates table instead of grouping
+# the order history, and is used whenever "aggregate_table" exists.
+SUMMARY_QUERIES = {
+    "customer_orders_summary": {
+        "sql": """
+            SELECT c.customer_id, c.first_name, c.last_name, c.email, COUNT(o.order_id) as order_count,
+                   SUM(o.total_amount) as total_spent
+            FROM customers c
+            LEFT JOIN orders o ON c.customer_id = o.customer_id
+            GROUP BY c.customer_id
+        """,
+        "aggregate_sql": """
+            SELECT c.customer_id, c.first_name, c.last_name, c.email, IFNULL(a.order_count, 0) as order_count,
+                   a.total_spent
+            FROM customers c
+            LEFT JOIN agg_customer_spend a ON c.customer_id = a.customer_id
+        """,
+        "aggregate_table": "agg_customer_spend",
+        "key": "customer_id",
+    },
+    "product_sales_summary": {
+        "sql": """
+            SELECT p.product_id, p.name, p.category, p.price, SUM(oi.quantity) as units_sold,
+                   SUM(oi.quantity * oi.price_per_unit) as revenue
+            FROM products p
+            LEFT JOIN order_items oi ON p.product_id = oi.product_id
+            GROUP BY p.product_id
+        """,
+        "aggregate_sql": """
+            SELECT p.product_id, p.name, p.category, p.price, a.units_sold, a.revenue
+            FROM products p
+            LEFT JOIN agg_product_sales a ON p.product_id = a.product_id
+        """,
+        "aggregate_table": "agg_product_sales",
+        "key": "product_id",
+        # Best sellers first; products without sales count as zero revenue
+        "order": ["-IFNULL(revenue, 0)", "product_id"],
+    },
+}
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _summary_sql(summary, table_names):
+    return summary["aggregate_sql"] if summary["aggregate_table"] in table_names else summary["sql"]
+
+
+def _load_schema(conn):
     cursor = conn.cursor()
-
-    # Get list of all tables in the database
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-
-    results = {}
-
-    # Helper function to display table data
-    def display_table(table_name):
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = [col[1] for col in cursor.fetchall()]
-
-        cursor.execute(f"SELECT * FROM {table_name}")
-        rows = cursor.fetchall()
-
-        df = pd.DataFrame(rows, columns=columns)
-        return df
-
-    # Collect schema information
-    schema_info = {}
-    for table in tables:
-        table_name = table[0]
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = cursor.fetchall()
-        schema_info[table_name] = [{'name': col[1], 'type': col[2], 'primary_key': bool(col[5])} for col in columns]
-
-    results['schema'] = schema_info
-
-    # Collect data for each table
-    table_data = {}
-    for table in tables:
-        table_name = table[0]
-        table_data[table_name] = display_table(table_name)
-
-    results['table_data'] = table_data
-
-    # Collect customer orders summary
-    cursor.execute("""
-    SELECT c.customer_id, c.first_name, c.last_name, c.email, COUNT(o.order_id) as order_count, 
-           SUM(o.total_amount) as total_spent
-    FROM customers c
-    LEFT JOIN orders o ON c.customer_id = o.customer_id
-    GROUP BY c.customer_id
-    """)
-    customer_orders = cursor.fetchall()
-    df_customer_orders = pd.DataFrame(customer_orders, 
-                                      columns=['customer_id', 'first_name', 'last_name', 'email', 
-                                               'order_count', 'total_spent'])
-
-    results['customer_orders_summary'] = df_customer_orders
-
-    # Collect product sales summary
-    cursor.execute("""
-    SELECT p.product_id, p.name, p.category, p.price, SUM(oi.quantity) as units_sold, 
-           SUM(oi.quantity * oi.price_per_unit) as revenue
-    FROM products p
-    LEFT JOIN order_items oi ON p.product_id = oi.product_id
-    GROUP BY p.product_id
-    ORDER BY revenue DESC
-    """)
-    product_sales = cursor.fetchall()
-    df_product_sales = pd.DataFrame(product_sales, 
-                                   columns=['product_id', 'name', 'category', 'price', 
-                                            'units_sold', 'revenue'])
-
-    results['product_sales_summary'] = df_product_sales
-
-    # Close connection
-    conn.close()
-
-    return results
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+    schema = {}
+    for (table_name,) in cursor.fetchall():
+        cursor.execute(f"PRAGMA table_info({_quote(table_name)})")
+        schema[table_name] = [
+            {'name': col[1], 'type': col[2], 'primary_key': bool(col[5])} for col in cursor.fetchall()
+        ]
+    for name, summary in SUMMARY_QUERIES.items():
+        cursor.execute(f"SELECT * FROM ({_summary_sql(summary, schema)}) LIMIT 0")
+        schema[name] = [{'name': col[0], 'type': None, 'primary_key': col[0] == summary['key']}
+                        for col in cursor.description]
+    return schema
+
+
+# Database path -> (schema_version, schema)
+_schema_cache = {}
+
+
+def _schema_for(conn, db_path):
+    """Schema for a borrowed connection, reloaded only when PRAGMA schema_version moves."""
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    cached = _schema_cache.get(db_path)
+    if cached is None or cached[0] != version:
+        cached = (version, _load_schema(conn))
+        _schema_cache[db_path] = cached
+    return cached[1]
+
+
+def get_schema(db_path=DB_PATH):
+    """Tables, summaries and their columns. Cached until the database schema changes."""
+    with read_connection(db_path) as conn:
+        return _schema_for(conn, db_path)
+
+
+def _encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def page_key(table):
+    """SQL expressions, all ascending, that order a table or summary and key its cursors."""
+    summary = SUMMARY_QUERIES.get(table)
+    if summary is None:
+        return ["rowid"]
+    return summary.get("order") or [_quote(summary["key"])]
+
+
+def _where_clause(filters, column_names):
+    clauses, params = [], []
+    for column, condition in (filters or {}).items():
+        if column not in column_names:
+            raise ValueError(f"Unknown filter column: {column}")
+        if isinstance(condition, dict):
+            op = str(condition.get("op", "=")).lower()
+            value = condition.get("value")
+        else:
+            op, value = "=", condition
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if value is None and op in ("=", "!="):
+            clauses.append(f"{_quote(column)} IS {'NOT ' if op == '!=' else ''}NULL")
+        else:
+            clauses.append(f"{_quote(column)} {op.upper()} ?")
+            params.append(value)
+    return clauses, params
+
+
+def page_query(schema, table, columns=None, filters=None, cursor=None):
+    """
+    SQL and parameters for one page of a table or summary (without the LIMIT value).
+    The page_key(table) expressions are selected ahead of the columns and make up the
+    keyset cursor. Returns (sql, params, columns).
+    """
+    if table not in schema:
+        raise ValueError(f"Unknown table: {table}. Available: {', '.join(sorted(schema))}")
+    column_names = [col['name'] for col in schema[table]]
+    columns = columns or column_names
+    unknown = [col for col in columns if col not in column_names]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+
+    if table in SUMMARY_QUERIES:
+        source = f"({_summary_sql(SUMMARY_QUERIES[table], schema)})"
+    else:
+        source = _quote(table)
+    keys = page_key(table)
+
+    clauses, params = _where_clause(filters, column_names)
+    if cursor:
+        values = _decode_cursor(cursor)
+        if not isinstance(values, list):
+            values = [values]
+        if len(values) != len(keys):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        clauses.append(f"({', '.join(keys)}) > ({', '.join('?' * len(keys))})")
+        params.extend(values)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    selected = [f"{expr} AS page_key_{i}" for i, expr in enumerate(keys)] + [_quote(col) for col in columns]
+    sql = f"SELECT {', '.join(selected)} FROM {source}{where} ORDER BY {', '.join(keys)} LIMIT ?"
+    return sql, params, columns
+
+
+def read_table(table, columns=None, filters=None, limit=DEFAULT_LIMIT, cursor=None, fmt="csv", db_path=DB_PATH):
+    """
+    Read one page of a table or summary. Columns are projected, filters are ANDed
+    equality/comparison conditions ({"col": value} or {"col": {"op": ">=", "value": v}}),
+    and pages follow the table's rowid (or the summary's order) from an opaque cursor.
+    Rows are streamed with fetchmany into CSV or JSON lines, followed by the row count
+    and the next cursor.
+    """
+    limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+    output = io.StringIO()
+
+    with read_connection(db_path) as conn:
+        sql, params, columns = page_query(_schema_for(conn, db_path), table, columns, filters, cursor)
+        writer = csv.writer(output) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+
+        # One extra row tells us whether another page exists
+        result = conn.execute(sql, params + [limit + 1])
+        key_count = len(result.description) - len(columns)
+        row_count, last_key, has_more = 0, None, False
+        while not has_more:
+            rows = result.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                if row_count == limit:
+                    has_more = True
+                    break
+                last_key = list(row[:key_count])
+                if writer:
+                    writer.writerow(row[key_count:])
+                else:
+                    output.write(json.dumps(dict(zip(columns, row[key_count:])), ensure_ascii=False) + "\n")
+                row_count += 1
+        # Finish the statement before the connection goes back to the pool
+        result.close()
+
+    next_cursor = _encode_cursor(last_key) if has_more else None
+    output.write(f"\nrows: {row_count}\nnext_cursor: {next_cursor or 'none'}")
+    return output.getvalue()
+
+
+def describe_schema(db_path=DB_PATH):
+    """Compact text description of every table and summary, for the schema tool."""
+    lines = []
+    for table, cols in get_schema(db_path).items():
+        described = ", ".join(
+            f"{col['name']}{' ' + col['type'] if col['type'] else ''}{' PK' if col['primary_key'] else ''}"
+            for col in cols
+        )
+        lines.append(f"{table}({described})")
+    return "\n".join(lines)
+
+
+# Function to display one page of database data in a compact format
+def display_database(table=None, columns=None, filters=None, limit=DEFAULT_LIMIT, cursor=None, fmt="csv",
+                     db_path=DB_PATH):
+    if table is None:
+        return ("No table given. Pass one of the tables below (and optionally columns, filters, "
+                f"limit, cursor):\n{describe_schema(db_path)}")
+    return read_table(table, columns=columns, filters=filters, limit=limit, cursor=cursor, fmt=fmt,
+                      db_path=db_path)
 
 # Example usage (uncomment the following lines to use directly):
 if __name__ == "__main__":
-     data = display_database('online_sales.db')
-     print(data)
+     print(describe_schema())
+     print(display_database('orders', limit=5))
@@ -1,16 +1,33 @@
+import asyncio
 import json
 import os
 import re
-from openai import OpenAI
+import sys
+from functools import lru_cache
+from openai import AsyncOpenAI
 from chunk_retrival import relevant_chunks_analysis
+from llm_cache import acached_completion
 from dotenv import load_dotenv
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def generate_reasoning_and_graph(query):
-    # Get top relevant text only (summarized or merged)
-    relevant_text = relevant_chunks_analysis(query)
+# The client is built on first use, so importing this module (e.g. in the server warm-up) stays cheap
+@lru_cache(maxsize=None)
+def get_client():
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+async def agenerate_reasoning_and_graph(query, include_graph=True, openai_client=None, progress=None):
+    """
+    Retrieve context for the query, then request the summary and (optionally) the
+    knowledge graph concurrently. Returns (summary, graph); graph is None when skipped.
+    progress, if given, is awaited as progress(step, total_steps) after each stage.
+    """
+    openai_client = openai_client or get_client()
+
+    # Get top relevant text only (summarized or merged); retrieval is blocking
+    relevant_text = await asyncio.to_thread(relevant_chunks_analysis, query)
+    if progress is not None:
+        await progress(1, 2)
 
     # Truncate text to ~3000 tokens worth (~12K characters)
     if len(relevant_text) > 12000:
@@ -23,14 +40,21 @@ def generate_reasoning_and_graph(query):
         f"Context:\n{relevant_text}"
     )
 
-    reasoning_response = client.chat.completions.create(
+    reasoning_request = acached_completion(
+        openai_client,
         model="gpt-4o",
         messages=[
             {"role": "user", "content": reasoning_prompt}
         ],
-        temperature=0.2
+        temperature=0.2,
+        similarity_text=query
     )
-    human_summary = reasoning_response.choices[0].message.content.strip()
+
+    if not include_graph:
+        human_summary = (await reasoning_request).strip()
+        if progress is not None:
+            await progress(2, 2)
+        return human_summary, None
 
     # Short prompt for JSON graph
     graph_prompt = (
@@ -43,13 +67,19 @@ def generate_reasoning_and_graph(query):
     )
     #print("[DEBUG] Sending reasoning prompt to OpenAI...", flush=True)
 
-    graph_response = client.chat.completions.create(
+    graph_request = acached_completion(
+        openai_client,
         model="gpt-4o",
         messages=[{"role": "user", "content": graph_prompt}],
         temperature=0.2
     )
 
-    graph_json_raw = graph_response.choices[0].message.content.strip()
+    # Both completions depend only on relevant_text, so they run concurrently
+    human_summary, graph_json_raw = await asyncio.gather(reasoning_request, graph_request)
+    if progress is not None:
+        await progress(2, 2)
+    human_summary = human_summary.strip()
+    graph_json_raw = graph_json_raw.strip()
 
     try:
         if "```" in graph_json_raw:
@@ -63,10 +93,17 @@ def generate_reasoning_and_graph(query):
         #print("[OK] Note graph saved to note_graph.json", flush=True)
 
     except Exception as e:
-        print(f"[ERROR] Could not parse graph JSON: {e}", flush=True)
-        print(f"[DEBUG] Raw output:\n{graph_json_raw[:300]}", flush=True)
+        print(f"[ERROR] Could not parse graph JSON: {e}", file=sys.stderr, flush=True)
+        print(f"[DEBUG] Raw output:\n{graph_json_raw[:300]}", file=sys.stderr, flush=True)
         graph_data = {}
         
     #print("[DEBUG] MCP Client finishing. Cleaning up...", flush=True)
 
     return human_summary, graph_data
+
+def generate_reasoning_and_graph(query, include_graph=True):
+    """Synchronous entry point; runs the async pipeline on its own event loop and client."""
+    async def run():
+        async with AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")) as openai_client:
+            return await agenerate_reasoning_and_graph(query, include_graph, openai_client=openai_client)
+    return asyncio.run(run())
@@ -0,0 +1,246 @@
+"""
+Synthetic online_sales database generator for load testing the report and display tools.
+
+    python generate_sales_data.py --db load_sales.db --customers 1000000 --products 50000 \\
+                                  --order-items 20000000 [--seed 42] [--workers 4] [--force]
+
+Customers and products are generated up front from a seeded RNG and kept as in-memory
+arrays (prices, address parts), so orders never look anything up in the database.
+Orders and their items are generated in fixed-size chunks, each with its own seed
+derived from --seed and the chunk number, so the output is the same for any --workers.
+Worker processes generate chunks and a single writer inserts them in order with batched
+executemany calls, one transaction per chunk, under bulk-load PRAGMAs. Indexes and the
+sales aggregates are built once at the end and the database is switched to WAL.
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from database_creation import create_indexes, create_schema
+from sales_aggregates import install_aggregates
+
+CHUNK_ITEMS = 250_000
+LOAD_PRAGMAS = [
+    "PRAGMA journal_mode=OFF",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-262144",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA locking_mode=EXCLUSIVE",
+]
+
+FIRST_NAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Emily",
+               "William", "Sarah", "Daniel", "Jessica", "Thomas", "Karen", "Wei", "Priya", "Carlos", "Aisha"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Martinez", "Lee",
+              "Wilson", "Anderson", "Taylor", "Thomas", "Moore", "Chen", "Patel", "Nguyen", "Kim", "Lopez"]
+STREETS = ["Main St", "Oak Ave", "Pine Blvd", "Cedar Dr", "Maple Ln", "Elm St", "Park Ave", "Lake Rd",
+           "Hill St", "River Rd", "Sunset Blvd", "Church St"]
+CITIES = [("New York", "NY", "10001"), ("Los Angeles", "CA", "90001"), ("Chicago", "IL", "60007"),
+          ("Houston", "TX", "77001"), ("Phoenix", "AZ", "85001"), ("Philadelphia", "PA", "19019"),
+          ("San Antonio", "TX", "78201"), ("San Diego", "CA", "92101"), ("Dallas", "TX", "75201"),
+          ("Seattle", "WA", "98101"), ("Denver", "CO", "80201"), ("Boston", "MA", "02108"),
+          ("Atlanta", "GA", "30301"), ("Miami", "FL", "33101"), ("Columbus", "OH", "43085")]
+CATEGORIES = {
+    "Electronics": (["Laptop", "Smartphone", "Headphones", "Monitor", "Tablet", "Camera"], 50.0, 2000.0),
+    "Clothing": (["T-Shirt", "Jacket", "Jeans", "Sweater", "Dress", "Hoodie"], 10.0, 150.0),
+    "Kitchen": (["Knife Set", "Coffee Maker", "Blender", "Pan", "Kettle", "Toaster"], 15.0, 300.0),
+    "Sports": (["Yoga Mat", "Dumbbell", "Tennis Racket", "Bicycle Helmet", "Football"], 10.0, 250.0),
+    "Footwear": (["Running Shoes", "Boots", "Sandals", "Sneakers", "Loafers"], 25.0, 200.0),
+    "Books": (["Novel", "Cookbook", "Biography", "Textbook", "Comic"], 5.0, 80.0),
+}
+ADJECTIVES = ["Pro", "Classic", "Ultra", "Eco", "Smart", "Deluxe", "Mini", "Max", "Lite", "Prime"]
+STATUSES = (["Delivered", "Shipped", "Pending", "Cancelled"], [60, 20, 12, 8])
+PAYMENT_METHODS = (["Credit Card", "PayPal", "Apple Pay", "Google Pay"], [50, 25, 13, 12])
+ORDER_DATES = [(datetime.date(2023, 1, 1) + datetime.timedelta(days=d)).isoformat() for d in range(730)]
+
+# Per-process generation context, set once per worker by _init_worker
+_context = {}
+
+
+def generate_customers(rng, count):
+    """
+    Customer rows plus the address arrays orders use for shipping addresses:
+    (rows, street numbers, street indexes, city indexes), indexed by customer_id - 1.
+    """
+    rows = []
+    street_numbers, street_indexes, city_indexes = array("I"), array("H"), array("H")
+    for customer_id in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        number, street, city = rng.randint(1, 9999), rng.randrange(len(STREETS)), rng.randrange(len(CITIES))
+        street_numbers.append(number)
+        street_indexes.append(street)
+        city_indexes.append(city)
+        city_name, state, zipcode = CITIES[city]
+        rows.append((customer_id, first, last, f"{first.lower()}.{last.lower()}{customer_id}@example.com",
+                     f"{number} {STREETS[street]}", city_name, state, zipcode,
+                     ORDER_DATES[rng.randrange(365)], ORDER_DATES[rng.randrange(365, len(ORDER_DATES))]))
+    return rows, street_numbers, street_indexes, city_indexes
+
+
+def generate_products(rng, count):
+    """Product rows and their prices as an array indexed by product_id - 1."""
+    rows, prices = [], array("d")
+    categories = list(CATEGORIES)
+    for product_id in range(1, count + 1):
+        category = rng.choice(categories)
+        nouns, low, high = CATEGORIES[category]
+        noun = rng.choice(nouns)
+        price = round(rng.uniform(low, high), 2)
+        prices.append(price)
+        rows.append((product_id, f"{rng.choice(ADJECTIVES)} {noun} {product_id}", f"{category} item: {noun.lower()}",
+                     category, price, rng.randint(0, 500), ORDER_DATES[rng.randrange(365)]))
+    return rows, prices
+
+
+def _init_worker(prices, street_numbers, street_indexes, city_indexes):
+    _context.update(prices=prices, street_numbers=street_numbers, street_indexes=street_indexes,
+                    city_indexes=city_indexes)
+
+
+def generate_chunk(seed, item_quota):
+    """
+    One chunk of orders and order items. Orders are numbered from 0 within the chunk
+    and the writer offsets them; each order has 1-5 distinct products until the quota is met.
+    """
+    rng = random.Random(seed)
+    prices = _context["prices"]
+    street_numbers, street_indexes, city_indexes = (
+        _context["street_numbers"], _context["street_indexes"], _context["city_indexes"])
+    customer_count, product_count = len(street_numbers), len(prices)
+    statuses, status_weights = STATUSES
+    methods, method_weights = PAYMENT_METHODS
+
+    orders, items = [], []
+    while len(items) < item_quota:
+        order_index = len(orders)
+        customer = rng.randrange(customer_count)
+        city_name, state, zipcode = CITIES[city_indexes[customer]]
+        shipping_address = (f"{street_numbers[customer]} {STREETS[street_indexes[customer]]}, "
+                            f"{city_name}, {state} {zipcode}")
+        total_amount = 0.0
+        count = min(rng.randint(1, 5), item_quota - len(items), product_count)
+        for product in rng.sample(range(product_count), count):
+            quantity = rng.randint(1, 3)
+            price = prices[product]
+            total_amount += price * quantity
+            items.append((order_index, product + 1, quantity, price))
+        orders.append((customer + 1, rng.choice(ORDER_DATES), round(total_amount, 2),
+                       rng.choices(statuses, status_weights)[0], shipping_address,
+                       rng.choices(methods, method_weights)[0]))
+    return orders, items
+
+
+def _write_chunk(conn, orders, items, first_order_id):
+    with conn:
+        conn.executemany(
+            "INSERT INTO orders (order_id, customer_id, order_date, total_amount, status, shipping_address, "
+            "payment_method) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((first_order_id + i,) + order for i, order in enumerate(orders)),
+        )
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_per_unit) VALUES (?, ?, ?, ?)",
+            ((first_order_id + order_index, product_id, quantity, price)
+             for order_index, product_id, quantity, price in items),
+        )
+
+
+def _chunks(seed, order_items, chunk_items):
+    for number, start in enumerate(range(0, order_items, chunk_items)):
+        yield seed * 1_000_003 + number, min(chunk_items, order_items - start)
+
+
+def _generated_chunks(chunks, workers, context):
+    """Generated (orders, items) per chunk, in chunk order, from worker processes when workers > 1."""
+    if workers <= 1:
+        _init_worker(*context)
+        for chunk_seed, quota in chunks:
+            yield generate_chunk(chunk_seed, quota)
+        return
+    # A bounded window of submitted chunks keeps memory flat while the writer catches up
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=context) as pool:
+        pending = deque()
+        for chunk_seed, quota in chunks:
+            pending.append(pool.submit(generate_chunk, chunk_seed, quota))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_database(db_path, customers, products, order_items, seed=42, workers=1, chunk_items=CHUNK_ITEMS,
+                      aggregates=True):
+    """Create db_path and fill it; returns the number of orders written."""
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    customer_rows, street_numbers, street_indexes, city_indexes = generate_customers(rng, customers)
+    product_rows, prices = generate_products(rng, products)
+
+    conn = sqlite3.connect(db_path)
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+    # Indexes are built once after the load rather than maintained row by row
+    create_schema(conn.cursor(), indexes=False)
+    with conn:
+        conn.executemany("INSERT INTO customers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", customer_rows)
+        conn.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?)", product_rows)
+    del customer_rows, product_rows
+    print(f"[Generator] {customers:,} customers and {products:,} products in {time.perf_counter() - start:.1f}s")
+
+    context = (prices, street_numbers, street_indexes, city_indexes)
+    next_order_id, written = 1, 0
+    for orders, items in _generated_chunks(_chunks(seed, order_items, chunk_items), workers, context):
+        _write_chunk(conn, orders, items, next_order_id)
+        next_order_id += len(orders)
+        written += len(items)
+        print(f"[Generator] {written:,}/{order_items:,} order items")
+
+    index_start = time.perf_counter()
+    create_indexes(conn.cursor())
+    conn.commit()
+    if aggregates:
+        install_aggregates(conn)
+    print(f"[Generator] Indexes{' and aggregates' if aggregates else ''} in {time.perf_counter() - index_start:.1f}s")
+
+    conn.execute("PRAGMA locking_mode=NORMAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    print(f"[Generator] Wrote {next_order_id - 1:,} orders and {written:,} order items to {db_path} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return next_order_id - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="load_sales.db")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--order-items", type=int, default=20_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-items", type=int, default=CHUNK_ITEMS)
+    parser.add_argument("--no-aggregates", action="store_true", help="skip the sales_aggregates tables")
+    parser.add_argument("--force", action="store_true", help="replace an existing database file")
+    args = parser.parse_args()
+
+    for option in ("customers", "products", "order_items", "workers", "chunk_items"):
+        if getattr(args, option) <= 0:
+            parser.error(f"--{option.replace('_', '-')} must be positive")
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} already exists; pass --force to replace it")
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    generate_database(args.db, args.customers, args.products, args.order_items, seed=args.seed,
+                      workers=args.workers, chunk_items=args.chunk_items, aggregates=not args.no_aggregates)
+
+
+if __name__ == "__main__":
+    main()
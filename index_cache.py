@@ -0,0 +1,96 @@
+import asyncio
+import os
+import threading
+import time
+
+from index_store import INDEX_DB, open_index_store
+from retrieval_index import RETRIEVAL_INDEX_FILE, load_retrieval_index
+
+
+class IndexCache:
+    """
+    Process-wide cache of the open index store and its loaded retrieval index.
+
+    Every lookup stats the index files; only when their mtimes move is the store
+    version read, and only when the version changed is the retrieval index reloaded.
+    Queries never rebuild the retrieval index: while an indexing run moves the store
+    ahead of it, the loaded index keeps being served until the indexer publishes a new
+    one. Thread-safe, so it can be shared by executor threads serving MCP tool calls.
+    """
+
+    def __init__(self, db_path=INDEX_DB, retrieval_path=RETRIEVAL_INDEX_FILE):
+        self.db_path = db_path
+        self.retrieval_path = retrieval_path
+        self._lock = threading.Lock()
+        self._store = None
+        self._retrieval_index = None
+        self._file_key = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.reload_seconds = 0.0
+        self.last_reload_seconds = 0.0
+
+    def _stat_key(self):
+        key = []
+        for path in (self.db_path, f"{self.db_path}-wal", self.retrieval_path):
+            try:
+                st = os.stat(path)
+                key.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                key.append(None)
+        return tuple(key)
+
+    def get(self):
+        """Return (IndexStore, RetrievalIndex), reloading them only if the index changed on disk."""
+        file_key = self._stat_key()
+        with self._lock:
+            if self._retrieval_index is not None and file_key == self._file_key:
+                self.hits += 1
+                return self._store, self._retrieval_index
+
+            if self._store is None:
+                self._store = open_index_store(self.db_path)
+            if self._retrieval_index is not None and (
+                    self._retrieval_index.fingerprint == self._store.version()
+                    or file_key[-1] == self._file_key[-1]):
+                # Either the files were touched (e.g. a WAL checkpoint) but the indexed content is
+                # the same, or the store moved on and the indexer has not published a new index yet
+                self._file_key = file_key
+                self.hits += 1
+                return self._store, self._retrieval_index
+
+            self.misses += 1
+            start = time.perf_counter()
+            self._retrieval_index = load_retrieval_index(self._store, path=self.retrieval_path, rebuild_stale=False)
+            self.last_reload_seconds = time.perf_counter() - start
+            self.reload_seconds += self.last_reload_seconds
+            self.reloads += 1
+            # Re-stat after loading: a first build may have written the retrieval index file
+            self._file_key = self._stat_key()
+            return self._store, self._retrieval_index
+
+    async def aget(self):
+        """Async variant for event-loop callers; a reload never blocks the loop."""
+        return await asyncio.to_thread(self.get)
+
+    def invalidate(self):
+        with self._lock:
+            self._retrieval_index = None
+            self._file_key = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "reloads": self.reloads,
+                "reload_seconds_total": round(self.reload_seconds, 4),
+                "last_reload_seconds": round(self.last_reload_seconds, 4),
+                "documents": len(self._retrieval_index.docs) if self._retrieval_index is not None else 0,
+            }
+
+
+index_cache = IndexCache()
@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INDEX_DB = os.getenv("INDEX_DB_PATH", "s3_file_index.db")
+LEGACY_INDEX_FILE = "s3_file_index.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    size INTEGER,
+    last_modified TEXT,
+    chunk_count INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    key TEXT NOT NULL REFERENCES files (key) ON DELETE CASCADE,
+    chunk_no INTEGER NOT NULL,
+    content_hash TEXT,
+    token_count INTEGER,
+    summary TEXT,
+    PRIMARY KEY (key, chunk_no)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_chunks_content_hash ON chunks (content_hash);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class IndexStore:
+    """
+    SQLite store for the S3 file index: one row per file and one row per chunk.
+    Runs in WAL mode so retrieval can read while the indexer writes; every file is
+    upserted in its own transaction, so an interrupted run never corrupts the index.
+    """
+
+    def __init__(self, path=INDEX_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self._lock, self.conn:
+            self.conn.executescript(SCHEMA)
+            self.conn.execute(
+                "INSERT OR IGNORE INTO meta (name, value) VALUES ('store_id', ?), ('version', '0')",
+                (uuid.uuid4().hex,),
+            )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _bump_version(self):
+        self.conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'version'")
+
+    def version(self):
+        """Opaque token that changes whenever the indexed content changes."""
+        rows = dict(self._query("SELECT name, value FROM meta WHERE name IN ('store_id', 'version')"))
+        return f"{rows['store_id']}:{rows['version']}"
+
+    def upsert_file(self, key, entry):
+        """Atomically replace a file and all of its chunks. entry uses the JSON index layout."""
+        summaries = entry.get("summaries", [])
+        hashes = entry.get("chunk_hashes") or [None] * len(summaries)
+        token_counts = entry.get("chunk_tokens") or [None] * len(summaries)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (key, etag, size, last_modified, chunk_count, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry.get("etag"), entry.get("size"), entry.get("last_modified"),
+                 entry.get("chunks", len(summaries)), datetime.now(timezone.utc).isoformat()),
+            )
+            self.conn.execute("DELETE FROM chunks WHERE key = ?", (key,))
+            self.conn.executemany(
+                "INSERT INTO chunks (key, chunk_no, content_hash, token_count, summary) VALUES (?, ?, ?, ?, ?)",
+                [(key, i + 1, h, t, s) for i, (h, t, s) in enumerate(zip(hashes, token_counts, summaries))],
+            )
+            self._bump_version()
+
+    def delete_files(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM files WHERE key = ?", [(k,) for k in keys])
+            self._bump_version()
+
+    def file_states(self):
+        """Listing metadata per key, without loading any summaries."""
+        rows = self._query("""
+            SELECT f.key, f.etag, f.size, f.last_modified, f.chunk_count,
+                   EXISTS (SELECT 1 FROM chunks c WHERE c.key = f.key AND c.content_hash IS NOT NULL) AS hashed
+            FROM files f
+        """)
+        return {
+            row["key"]: {
+                "etag": row["etag"],
+                "size": row["size"],
+                "last_modified": row["last_modified"],
+                "chunks": row["chunk_count"],
+                "hashed": bool(row["hashed"]),
+            }
+            for row in rows
+        }
+
+    def summaries_for_hashes(self, hashes):
+        """Map of content hash -> summary for the given hashes that were summarized successfully."""
+        known = {}
+        hashes = list(set(h for h in hashes if h))
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row in self._query(
+                f"SELECT content_hash, summary FROM chunks WHERE content_hash IN ({placeholders}) "
+                "AND summary NOT LIKE '[Error]%'",
+                batch,
+            ):
+                known[row["content_hash"]] = row["summary"]
+        return known
+
+    def get_file(self, key):
+        files = self._query("SELECT * FROM files WHERE key = ?", (key,))
+        if not files:
+            return None
+        chunks = self._query(
+            "SELECT content_hash, token_count, summary FROM chunks WHERE key = ? ORDER BY chunk_no", (key,))
+        file = files[0]
+        return {
+            "etag": file["etag"],
+            "size": file["size"],
+            "last_modified": file["last_modified"],
+            "chunks": file["chunk_count"],
+            "chunk_hashes": [c["content_hash"] for c in chunks],
+            "chunk_tokens": [c["token_count"] for c in chunks],
+            "summaries": [c["summary"] for c in chunks],
+        }
+
+    def get_chunk(self, key, chunk_no):
+        rows = self._query(
+            "SELECT key, chunk_no, content_hash, token_count, summary FROM chunks WHERE key = ? AND chunk_no = ?",
+            (key, chunk_no),
+        )
+        return dict(rows[0]) if rows else None
+
+    def iter_chunks(self, batch_size=1000):
+        """Stream (key, chunk_no, summary) for every chunk using a dedicated read connection."""
+        reader = sqlite3.connect(self.path, timeout=30)
+        try:
+            cursor = reader.execute("SELECT key, chunk_no, summary FROM chunks ORDER BY key, chunk_no")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            reader.close()
+
+    def count_files(self):
+        return self._query("SELECT COUNT(*) FROM files")[0][0]
+
+    def to_dict(self):
+        """The whole index in the legacy s3_file_index.json layout."""
+        return {key: self.get_file(key) for (key,) in self._query("SELECT key FROM files ORDER BY key")}
+
+
+def migrate_json_index(json_path=LEGACY_INDEX_FILE, db_path=INDEX_DB):
+    """Import a legacy s3_file_index.json into the SQLite store. Returns the number of files imported."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    with IndexStore(db_path) as store:
+        for key, entry in index.items():
+            store.upsert_file(key, entry)
+    print(f"[Migrated] {len(index)} file(s) from {json_path} to {db_path}", file=sys.stderr)
+    return len(index)
+
+
+def open_index_store(path=INDEX_DB, legacy_json=LEGACY_INDEX_FILE):
+    """Open the index store, importing the legacy JSON index the first time the database is created."""
+    if not os.path.exists(path) and os.path.exists(legacy_json):
+        migrate_json_index(legacy_json, path)
+    return IndexStore(path)
+
+
+if __name__ == "__main__":
+    # python index_store.py [s3_file_index.json] [s3_file_index.db]
+    migrate_json_index(*sys.argv[1:3])
@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CACHE_DB = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+# Responses sampled above this temperature are not reproducible enough to reuse
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+# Near-duplicate mode reuses a response when the final user message embeds within this cosine similarity
+LLM_CACHE_NEAR_DUPLICATE = os.getenv("LLM_CACHE_NEAR_DUPLICATE", "0") in ("1", "true", "True")
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0.97"))
+# Most recently used entries of a scope compared against a near-duplicate lookup
+LLM_CACHE_NEAR_CANDIDATES = int(os.getenv("LLM_CACHE_NEAR_CANDIDATES", "1000"))
+
+# USD per 1M tokens (input, output), used to report money saved by cache hits
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_completions_scope ON completions (scope);
+CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions (last_access);
+"""
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Persistent chat completion cache keyed on model, messages and sampling parameters.
+
+    Entries expire after `ttl` seconds and the least recently used ones are evicted
+    once there are more than `max_entries`. In near-duplicate mode a miss on a call that
+    names its similarity_text (the variable part of the final message, e.g. the user's
+    query) falls back to the cached call with the most similar similarity_text among
+    calls that share everything else: model, parameters, preceding messages and the rest
+    of the final message. Calls without a similarity_text only ever hit exactly.
+    """
+
+    def __init__(self, path=LLM_CACHE_DB, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 near_duplicate=LLM_CACHE_NEAR_DUPLICATE, similarity=LLM_CACHE_SIMILARITY, embedder=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.near_duplicate = near_duplicate
+        self.similarity = similarity
+        self._embedder = embedder
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.dollars_saved = 0.0
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from retrieval_index import HashingEmbedder
+            self._embedder = HashingEmbedder()
+        return self._embedder
+
+    @staticmethod
+    def keys(model, messages, params, similarity_text=None):
+        """
+        (exact key, scope) for a request. The scope is the request with similarity_text
+        left out of the final message, or None when similarity_text is not part of it.
+        """
+        exact = _digest({"model": model, "messages": messages, "params": params})
+        last = (messages[-1].get("content") or "") if messages else ""
+        if not similarity_text or similarity_text not in last:
+            return exact, None
+        template = dict(messages[-1], content=last.replace(similarity_text, "\0"))
+        scope = _digest({"model": model, "messages": messages[:-1] + [template], "params": params})
+        return exact, scope
+
+    def _embed(self, text):
+        import numpy as np
+        vector = self.embedder.embed([text])[0]
+        return np.asarray(vector, dtype=np.float32)
+
+    def _record_hit(self, model, prompt_tokens, completion_tokens, near=False):
+        if near:
+            self.near_hits += 1
+        else:
+            self.hits += 1
+        prompt_tokens, completion_tokens = prompt_tokens or 0, completion_tokens or 0
+        self.tokens_saved += prompt_tokens + completion_tokens
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        self.dollars_saved += (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    def get(self, model, messages, params, similarity_text=None):
+        exact, scope = self.keys(model, messages, params, similarity_text)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT content, prompt_tokens, completion_tokens, created_at FROM completions WHERE key = ?",
+                (exact,),
+            ).fetchone()
+            if row and now - row[3] <= self.ttl:
+                with self.conn:
+                    self.conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, exact))
+                self._record_hit(model, row[1], row[2])
+                return row[0]
+
+            candidates = []
+            if self.near_duplicate and scope is not None:
+                candidates = self.conn.execute(
+                    "SELECT key, content, prompt_tokens, completion_tokens, embedding FROM completions "
+                    "WHERE scope = ? AND created_at >= ? AND embedding IS NOT NULL "
+                    "ORDER BY last_access DESC LIMIT ?",
+                    (scope, now - self.ttl, LLM_CACHE_NEAR_CANDIDATES),
+                ).fetchall()
+            if not candidates:
+                self.misses += 1
+                return None
+
+        # Similarities are computed outside the lock, so other cache traffic is not held up
+        import numpy as np
+        matrix = np.stack([np.frombuffer(c[4], dtype=np.float32) for c in candidates])
+        similarities = matrix @ self._embed(similarity_text)
+        best = int(similarities.argmax())
+        with self._lock:
+            if similarities[best] < self.similarity:
+                self.misses += 1
+                return None
+            key, content, prompt_tokens, completion_tokens, _ = candidates[best]
+            with self.conn:
+                self.conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            self._record_hit(model, prompt_tokens, completion_tokens, near=True)
+            return content
+
+    def put(self, model, messages, params, content, prompt_tokens=None, completion_tokens=None,
+            similarity_text=None):
+        exact, scope = self.keys(model, messages, params, similarity_text)
+        embedding = self._embed(similarity_text).tobytes() if self.near_duplicate and scope is not None else None
+        now = time.time()
+        with self._lock, self.conn:
+            # An entry that cannot be a near duplicate gets a scope of its own
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, scope, model, content, prompt_tokens, completion_tokens, embedding, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (exact, scope or exact, model, content, prompt_tokens, completion_tokens, embedding, now, now),
+            )
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= 100:
+                self._evict(now)
+
+    def _evict(self, now):
+        self._puts_since_evict = 0
+        self.conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        self.conn.execute(
+            "DELETE FROM completions WHERE key IN ("
+            "SELECT key FROM completions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def evict(self):
+        with self._lock, self.conn:
+            self._evict(time.time())
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM completions")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            entries = self.conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "near_duplicate_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "dollars_saved": round(self.dollars_saved, 4),
+            "entries": entries,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache():
+    """The process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompletionCache()
+        return _cache
+
+
+def _cacheable(params):
+    return params.get("temperature", 1.0) <= LLM_CACHE_MAX_TEMPERATURE and params.get("n", 1) == 1
+
+
+def _usage(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def cached_completion(client, model, messages, similarity_text=None, **params):
+    """
+    client.chat.completions.create through the completion cache. Returns the message content.
+    similarity_text is the variable part of the final message (e.g. the user's query) that
+    near-duplicate mode may match approximately; without it only exact repeats hit.
+    """
+    cache = get_completion_cache() if _cacheable(params) else None
+    if cache is not None:
+        content = cache.get(model, messages, params, similarity_text)
+        if content is not None:
+            return content
+
+    response = client.chat.completions.create(model=model, messages=messages, **params)
+    content = response.choices[0].message.content
+    if cache is not None and content is not None:
+        cache.put(model, messages, params, content, *_usage(response), similarity_text=similarity_text)
+    return content
+
+
+async def acached_completion(client, model, messages, similarity_text=None, **params):
+    """
+    Async variant of cached_completion for an AsyncOpenAI client. Cache lookups and writes
+    (SQLite under the cache lock, plus the near-duplicate scan) run on a worker thread, so
+    they never block the event loop.
+    """
+    cache = await asyncio.to_thread(get_completion_cache) if _cacheable(params) else None
+    if cache is not None:
+        content = await asyncio.to_thread(cache.get, model, messages, params, similarity_text)
+        if content is not None:
+            return content
+
+    response = await client.chat.completions.create(model=model, messages=messages, **params)
+    content = response.choices[0].message.content
+    if cache is not None and content is not None:
+        await asyncio.to_thread(cache.put, model, messages, params, content, *_usage(response),
+                                similarity_text=similarity_text)
+    return content
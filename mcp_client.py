@@ -1,49 +1,375 @@
 # mcp_client.py
 
 import asyncio
+import itertools
+import json
 import sys
 import os
-from typing import Optional
-from contextlib import AsyncExitStack
+import time
+from typing import AsyncIterator, Optional
 
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+import mcp.types as types
 
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 from dotenv import load_dotenv
+from context_budget import ContextBudget
 
 load_dotenv()
 
+# Maximum number of tool calls from one model response that run at the same time on one server
+MAX_TOOL_CONCURRENCY = int(os.getenv("MCP_MAX_TOOL_CONCURRENCY", "4"))
+
+# Coordinator mode: the plugin servers to connect to (a config laid out like
+# mcp_servers.example.json; unset runs a single server), how long startup waits for them
+# (slower servers join the tool catalog once connected) and how often a server that is
+# down may be retried
+SERVERS_CONFIG = os.getenv("MCP_SERVERS_CONFIG", "")
+CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "10"))
+# A connection attempt that has not initialized after this long is abandoned (a server
+# that exits during startup is otherwise only noticed here)
+STARTUP_TIMEOUT = float(os.getenv("MCP_STARTUP_TIMEOUT", "60"))
+RECONNECT_INTERVAL = float(os.getenv("MCP_RECONNECT_INTERVAL", "5"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("MCP_HEALTH_CHECK_TIMEOUT", "5"))
+# Joins server and tool name in the merged catalog; tool names sent to Anthropic allow [a-zA-Z0-9_-]
+NAMESPACE_SEPARATOR = "__"
+
+
+class NotifyingClientSession(ClientSession):
+    """ClientSession that routes server progress notifications to per-call callbacks."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._progress_callbacks = {}
+        self._progress_tokens = itertools.count(1)
+        self.on_tools_changed = None
+
+    async def _received_notification(self, notification: types.ServerNotification) -> None:
+        match notification.root:
+            case types.ProgressNotification(params=params):
+                callback = self._progress_callbacks.get(params.progressToken)
+                if callback is not None:
+                    await callback(params.progress, params.total)
+            case types.ToolListChangedNotification():
+                if self.on_tools_changed is not None:
+                    await self.on_tools_changed()
+            case _:
+                await super()._received_notification(notification)
+
+    async def call_tool_with_progress(self, name: str, arguments: dict | None, progress_callback) -> types.CallToolResult:
+        """tools/call with a progress token; progress_callback(progress, total) is awaited per notification."""
+        token = f"progress-{next(self._progress_tokens)}"
+        self._progress_callbacks[token] = progress_callback
+        try:
+            return await self.send_request(
+                types.ClientRequest(
+                    types.CallToolRequest(
+                        method="tools/call",
+                        params=types.CallToolRequestParams(
+                            name=name,
+                            arguments=arguments,
+                            _meta=types.RequestParams.Meta(progressToken=token),
+                        ),
+                    )
+                ),
+                types.CallToolResult,
+            )
+        finally:
+            self._progress_callbacks.pop(token, None)
+
+    async def drain_incoming(self):
+        # Notifications are also pushed to an unbuffered stream; without a reader the receive loop stalls
+        async for _ in self.incoming_messages:
+            pass
+
+
+async def _interleave_status(task: asyncio.Future, status: asyncio.Queue) -> AsyncIterator[str]:
+    """Yield status messages from the queue until the task finishes."""
+    while not task.done():
+        getter = asyncio.ensure_future(status.get())
+        await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            yield getter.result()
+        else:
+            getter.cancel()
+    while not status.empty():
+        yield status.get_nowait()
+
+
+def load_server_config(path: str) -> dict[str, StdioServerParameters]:
+    """
+    {server name: StdioServerParameters} from a config file laid out as
+    {"mcpServers": {name: {"command": ..., "args": [...], "env": {...}, "cwd": ...}}}.
+    command defaults to this Python interpreter and cwd to the config file's directory.
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    return {
+        name: StdioServerParameters(
+            command=entry.get("command", sys.executable),
+            args=entry.get("args", []),
+            env=entry.get("env"),
+            cwd=os.path.join(base_dir, entry.get("cwd", "."))
+        )
+        for name, entry in config["mcpServers"].items()
+    }
+
+
+class ServerConnection:
+    """
+    One MCP server of an MCPClient: its stdio subprocess, session, tool list and call limit.
+
+    The transport is entered and exited inside a single owner task, because anyio requires
+    its cancel scopes to be closed by the task that opened them. start() only launches that
+    task, so servers connect concurrently. The tool list of the last connection is kept
+    after the server goes away, so its tools stay routable and the next call reconnects.
+    """
+
+    def __init__(self, name: str, params: StdioServerParameters, max_tool_concurrency: int, on_tools_changed):
+        self.name = name
+        self.params = params
+        self.session: Optional[NotifyingClientSession] = None
+        self.tools: Optional[list[types.Tool]] = None
+        self.error: Optional[Exception] = None
+        self.tool_limit = asyncio.Semaphore(max_tool_concurrency)
+        self._on_tools_changed = on_tools_changed
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._last_attempt = None
+
+    @property
+    def connected(self) -> bool:
+        return self.session is not None
+
+    def start(self):
+        """Begin connecting in the background, unless connected, connecting or retried less than RECONNECT_INTERVAL ago."""
+        if self._task is not None and not self._task.done():
+            return
+        if self._last_attempt is not None and time.monotonic() - self._last_attempt < RECONNECT_INTERVAL:
+            return
+        self._last_attempt = time.monotonic()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self.error = None
+        self._task = asyncio.create_task(self._own())
+
+    async def wait_connected(self, timeout: Optional[float]) -> bool:
+        """Wait up to timeout seconds for the current connection attempt; True when connected."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.connected
+
+    async def _own(self):
+        try:
+            async with stdio_client(self.params) as (read, write):
+                async with NotifyingClientSession(read, write) as session:
+                    await asyncio.wait_for(session.initialize(), STARTUP_TIMEOUT)
+                    session.on_tools_changed = self._tools_changed
+                    drain = asyncio.create_task(session.drain_incoming())
+                    closing = asyncio.create_task(self._closing.wait())
+                    try:
+                        self.tools = (await asyncio.wait_for(session.list_tools(), STARTUP_TIMEOUT)).tools
+                        self.session = session
+                        self._ready.set()
+                        await self._on_tools_changed()
+                        # The drain ends when the server exits, which ends this connection too
+                        await asyncio.wait({drain, closing}, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        self.session = None
+                        drain.cancel()
+                        closing.cancel()
+        except Exception as e:
+            # anyio wraps the failure in (nested) exception groups; keep the underlying error
+            while len(getattr(e, "exceptions", ())) == 1:
+                e = e.exceptions[0]
+            self.error = e
+            print(f"\n[Coordinator] {self.name}: connection failed: {e!r}")
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def _tools_changed(self):
+        # Called from the session's receive loop, which must keep running to read the list_tools response
+        self._refresh_task = asyncio.create_task(self._refresh_tools())
+
+    async def _refresh_tools(self):
+        try:
+            self.tools = (await self.session.list_tools()).tools
+        except Exception as e:
+            print(f"\n[Coordinator] {self.name}: could not refresh tools: {e}")
+        await self._on_tools_changed()
+
+    async def healthy(self) -> bool:
+        try:
+            await asyncio.wait_for(self.session.send_ping(), HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        self._closing.set()
+        if self._task is None:
+            return
+        if not self.connected:
+            # Still starting: nothing waits on _closing yet, so the attempt is cancelled
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"\n[Coordinator] {self.name}: error while closing: {e}")
+
 
 class MCPClient:
-    def __init__(self):
-        self.session: Optional[ClientSession] = None
-        self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+    """
+    Tool-use loop over one MCP server (connect_to_server) or, in coordinator mode
+    (connect_to_servers), over many plugin servers at once. In coordinator mode the
+    servers' tool catalogs are merged with each tool named server__tool, every tool_use
+    is routed to the session that owns it and calls to different servers run in parallel,
+    each server with its own concurrency limit.
+    """
+
+    def __init__(self, max_tool_concurrency: int = MAX_TOOL_CONCURRENCY):
+        self.servers: dict[str, ServerConnection] = {}
+        self.namespaced = False
+        self.max_tool_concurrency = max_tool_concurrency
+        # The merged tool catalog is cached until a server connects or sends notifications/tools/list_changed
+        self._tools: Optional[list[types.Tool]] = None
+        # Catalog tool name -> (server name, tool name on that server)
+        self._routes: dict[str, tuple[str, str]] = {}
+        self.last_usage: Optional[dict] = None
+        self.anthropic = AsyncAnthropic()
+
+    async def connect(self, target: str):
+        """Connect to a server script, or to every server in a .json config (coordinator mode)."""
+        if target.endswith(".json"):
+            return await self.connect_to_servers(load_server_config(target))
+        return await self.connect_to_server(target)
 
     async def connect_to_server(self, server_script_path: str):
-        python_path = sys.executable
-        server_params = StdioServerParameters(
-            command=python_path,
+        server = self._add_server("mcp_server", StdioServerParameters(
+            command=sys.executable,
             args=[server_script_path]
-        )
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
-        await self.session.initialize()
+        ))
+        server.start()
+        if not await server.wait_connected(None):
+            raise server.error or RuntimeError(f"Could not connect to {server_script_path}")
 
-        response = await self.session.list_tools()
-        tools = response.tools
+        tools = await self.get_tools()
         print("\n✅ Connected to server with tools:", [tool.name for tool in tools])
         return tools
 
+    async def connect_to_servers(self, server_params: dict[str, StdioServerParameters], timeout: float = CONNECT_TIMEOUT):
+        """
+        Start every server concurrently and wait up to timeout seconds for them. Servers
+        that are still starting keep connecting in the background and join the catalog
+        when ready; servers that failed are retried on use.
+        """
+        self.namespaced = True
+        servers = [self._add_server(name, params) for name, params in server_params.items()]
+        for server in servers:
+            server.start()
+        await asyncio.gather(*(server.wait_connected(timeout) for server in servers))
+        if not any(server.connected for server in servers):
+            raise RuntimeError(f"None of the MCP servers connected: {[server.name for server in servers]}")
+        for server in servers:
+            if not server.connected:
+                print(f"\n[Coordinator] {server.name}: not ready after {timeout:g}s, continuing without it")
+
+        tools = await self.get_tools()
+        print("\n✅ Connected to servers with tools:", [tool.name for tool in tools])
+        return tools
+
+    def _add_server(self, name: str, params: StdioServerParameters) -> ServerConnection:
+        server = ServerConnection(name, params, self.max_tool_concurrency, self.invalidate_tools)
+        self.servers[name] = server
+        return server
+
+    async def get_tools(self) -> list[types.Tool]:
+        # Servers that are down get a (rate-limited) background reconnect; their tools join once they are up
+        for server in self.servers.values():
+            if not server.connected:
+                server.start()
+        if self._tools is None:
+            tools, routes = [], {}
+            for server in self.servers.values():
+                for tool in server.tools or []:
+                    name = f"{server.name}{NAMESPACE_SEPARATOR}{tool.name}" if self.namespaced else tool.name
+                    routes[name] = (server.name, tool.name)
+                    tools.append(tool.model_copy(update={"name": name}) if self.namespaced else tool)
+            self._tools, self._routes = tools, routes
+        return self._tools
+
+    async def invalidate_tools(self):
+        self._tools = None
+
+    async def healthy(self) -> bool:
+        """True when at least one server is connected and every connected server answers a ping."""
+        connected = [server for server in self.servers.values() if server.connected]
+        return bool(connected) and all(await asyncio.gather(*(server.healthy() for server in connected)))
+
+    async def call_tool(self, tool_name: str, tool_args: dict, status: Optional[asyncio.Queue] = None) -> str:
+        """
+        Call one tool on the server that owns it, under that server's fan-out limit;
+        failures are returned as text for the model. A server that is down is reconnected
+        first. Tool start and server progress notifications are put on the status queue, if given.
+        """
+        async def on_progress(progress, total):
+            if status is not None:
+                status.put_nowait(f"⏳ {tool_name}: {progress:g}" + (f"/{total:g}" if total else ""))
+
+        if tool_name not in self._routes:
+            return f"[error] Unknown tool: {tool_name}"
+        server_name, server_tool = self._routes[tool_name]
+        server = self.servers[server_name]
+        if not server.connected:
+            server.start()
+            if not await server.wait_connected(CONNECT_TIMEOUT):
+                return f"[error] {tool_name} failed: server {server_name} is unavailable ({server.error or 'not ready'})"
+
+        async with server.tool_limit:
+            print(f"\n🔧 Calling tool: {tool_name} with args: {tool_args}")
+            if status is not None:
+                status.put_nowait(f"🔧 Calling tool: {tool_name}")
+            try:
+                result = await server.session.call_tool_with_progress(server_tool, tool_args, on_progress)
+                return result.content[0].text
+            except Exception as e:
+                if not await server.healthy():
+                    # Dropped so the next call to this server reconnects
+                    await server.close()
+                return f"[error] {tool_name} failed: {e}"
+
     async def process_query(self, query: str) -> str:
-        tools = await self.session.list_tools()
+        final_response = ""
+        async for kind, text in self._query_events(query, stream=False):
+            if kind == "text":
+                final_response += text
+        return final_response.strip()
+
+    async def process_query_stream(self, query: str) -> AsyncIterator[str]:
+        """
+        Stream the answer: model text is yielded token by token as Anthropic produces it,
+        and status lines are yielded while tools run.
+        """
+        async for kind, text in self._query_events(query, stream=True):
+            yield text if kind == "text" else f"\n\n_{text}_\n\n"
+
+    async def _query_events(self, query: str, stream: bool) -> AsyncIterator[tuple[str, str]]:
+        """Run the tool-use loop, yielding ("text", delta) and ("status", message) events."""
+        tools = await self.get_tools()
         tool_descriptions = "\n".join([
-            f"- {tool.name}: {tool.description}" for tool in tools.tools
+            f"- {tool.name}: {tool.description}" for tool in tools
         ])
 
         messages = [{
@@ -65,13 +391,17 @@ class MCPClient:
             "name": tool.name,
             "description": tool.description,
             "input_schema": tool.inputSchema
-        } for tool in tools.tools]
+        } for tool in tools]
 
-        final_response = ""
+        budget = ContextBudget()
+        budget.set_fixed_context(system_prompt, available_tools)
+        tool_output_indices = []
         max_rounds = 8
 
         for round_num in range(max_rounds):
-            response = self.anthropic.messages.create(
+            # Older tool outputs are shrunk so the prompt does not keep growing every round
+            budget.fit(messages, tool_output_indices)
+            request = dict(
                 model="claude-3-5-sonnet-latest",
                 max_tokens=1000,
                 system=system_prompt,
@@ -79,23 +409,43 @@ class MCPClient:
                 tools=available_tools
             )
 
-            tool_used = False
+            if stream:
+                async with self.anthropic.messages.stream(**request) as response_stream:
+                    async for event in response_stream:
+                        if event.type == "content_block_start" and event.content_block.type == "text":
+                            yield "text", "\n"
+                        elif event.type == "text":
+                            yield "text", event.text
+                    response = await response_stream.get_final_message()
+            else:
+                response = await self.anthropic.messages.create(**request)
+                for content in response.content:
+                    if content.type == "text":
+                        yield "text", f"\n{content.text}"
+            budget.record(messages, response.usage)
+
+            # Independent tool calls from the same response run concurrently
+            tool_calls = [content for content in response.content if content.type == "tool_use"]
+            status = asyncio.Queue()
+            tools_task = asyncio.ensure_future(asyncio.gather(*(
+                self.call_tool(content.name, content.input or {}, status) for content in tool_calls
+            )))
+            async for message in _interleave_status(tools_task, status):
+                yield "status", message
+            tool_outputs = tools_task.result()
+            outputs_by_id = {content.id: output for content, output in zip(tool_calls, tool_outputs)}
 
+            # Reassemble text and tool results in the order the model emitted them
             for content in response.content:
                 if content.type == "text":
                     messages.append({"role": "assistant", "content": content.text})
-                    final_response += f"\n{content.text}"
 
                 elif content.type == "tool_use":
-                    tool_used = True
                     tool_name = content.name
-                    tool_args = content.input or {}
-
-                    print(f"\n🔧 Calling tool: {tool_name} with args: {tool_args}")
-                    result = await self.session.call_tool(tool_name, tool_args)
-                    tool_output = result.content[0].text
+                    tool_output = budget.clip_tool_output(outputs_by_id[content.id])
 
                     # Inject tool output + re-prompt reasoning step
+                    tool_output_indices.append(len(messages))
                     messages.append({
                         "role": "assistant",
                         "content": f"[{tool_name} result]:\n{tool_output}"
@@ -108,10 +458,12 @@ class MCPClient:
                         )
                     })
 
-            if not tool_used:
+            if not tool_calls:
                 break
 
-        return final_response.strip()
+        self.last_usage = budget.usage()
+        yield "status", (f"📈 Tokens: {self.last_usage['input_tokens']} in / "
+                         f"{self.last_usage['output_tokens']} out over {self.last_usage['rounds']} round(s)")
 
     async def chat_loop(self):
         print("\n🤖 MCP Client Started")
@@ -123,18 +475,25 @@ class MCPClient:
                     break
                 response = await self.process_query(query)
                 print("\n🧠 Response:\n", response)
+                print(f"\n📈 Tokens: {self.last_usage['input_tokens']} in / "
+                      f"{self.last_usage['output_tokens']} out over {self.last_usage['rounds']} round(s)")
             except Exception as e:
                 print(f"\n❌ Error: {str(e)}")
 
     async def cleanup(self):
-        await self.exit_stack.aclose()
+        await asyncio.gather(*(server.close() for server in self.servers.values()))
 
 
 async def main():
+    # A server script, or a .json server config for coordinator mode (MCP_SERVERS_CONFIG when set)
     if len(sys.argv) < 2:
-        server_path = "./mcp_server.py"
+        server_path = SERVERS_CONFIG or "./mcp_server.py"
     else:
         server_path = sys.argv[1]
+    if server_path.endswith(".json"):
+        print(f"[Client] Coordinator mode: starting the servers in {server_path}")
+    else:
+        print(f"[Client] Single server: {server_path}")
 
     if sys.platform == 'win32':
         import msvcrt
@@ -143,7 +502,7 @@ async def main():
 
     client = MCPClient()
     try:
-        await client.connect_to_server(server_path)
+        await client.connect(server_path)
         await client.chat_loop()
     finally:
         await client.cleanup()
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import queue
+import threading
+
+from mcp_client import MCPClient
+
+POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+
+
+class PooledSession:
+    """
+    One MCPClient connected to its own mcp_server.py subprocess, or to its own set of
+    plugin servers when server_path is a coordinator config (.json).
+
+    The stdio transport is entered and exited inside a single owner task, because
+    anyio requires its cancel scopes to be closed by the task that opened them.
+    """
+
+    def __init__(self, server_path):
+        self.server_path = server_path
+        self.client = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task = None
+        self._error = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._own())
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    async def _own(self):
+        client = MCPClient()
+        try:
+            await client.connect(self.server_path)
+            self.client = client
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+        try:
+            if self._error is None:
+                await self._closing.wait()
+        finally:
+            await client.cleanup()
+
+    async def healthy(self):
+        return await self.client.healthy()
+
+    async def close(self):
+        self._closing.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                print(f"[MCP Pool] Error while closing session: {e}")
+
+
+class MCPClientPool:
+    """
+    Long-lived pool of MCP sessions for the Streamlit front end.
+
+    Sessions live on a background event loop thread, so server processes (and their
+    in-memory caches) survive across queries. Each query takes an idle session from
+    the queue, pings it first, and replaces it if the ping or the query fails.
+    Streamlit script threads call process_query() concurrently.
+    """
+
+    def __init__(self, server_path="./mcp_server.py", size=POOL_SIZE):
+        self.server_path = server_path
+        self.size = size
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="mcp-pool", daemon=True)
+        self._thread.start()
+        self._idle = None
+        self._sessions = set()
+        self._submit(self._start()).result()
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _connect(self):
+        session = await PooledSession(self.server_path).start()
+        self._sessions.add(session)
+        return session
+
+    async def _replace(self, session):
+        self._sessions.discard(session)
+        await session.close()
+        return await self._connect()
+
+    async def _start(self):
+        self._idle = asyncio.Queue()
+        results = await asyncio.gather(*(self._connect() for _ in range(self.size)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[MCP Pool] Could not start a server session: {result}")
+            else:
+                self._idle.put_nowait(result)
+        if self._idle.empty():
+            raise RuntimeError("No MCP server session could be started")
+
+    async def _acquire(self):
+        session = await self._idle.get()
+        if not await session.healthy():
+            print("[MCP Pool] Session failed health check, reconnecting")
+            try:
+                session = await self._replace(session)
+            except Exception:
+                # Keep the slot so a later query can retry the reconnect
+                self._idle.put_nowait(session)
+                raise
+        return session
+
+    async def _run_query(self, query):
+        session = await self._acquire()
+        try:
+            return await session.client.process_query(query)
+        except Exception:
+            if not await session.healthy():
+                session = await self._replace(session)
+            raise
+        finally:
+            self._idle.put_nowait(session)
+
+    def process_query(self, query, timeout=None):
+        """Run a query on an idle session; blocks the calling (Streamlit) thread until done."""
+        return self._submit(self._run_query(query)).result(timeout)
+
+    async def _pump_stream(self, query, items, done):
+        try:
+            session = await self._acquire()
+        except Exception as e:
+            items.put(e)
+            items.put(done)
+            return
+        try:
+            async for chunk in session.client.process_query_stream(query):
+                items.put(chunk)
+        except Exception as e:
+            items.put(e)
+            if not await session.healthy():
+                session = await self._replace(session)
+        finally:
+            self._idle.put_nowait(session)
+            items.put(done)
+
+    def stream_query(self, query):
+        """
+        Generator over the streamed answer for a query, for st.write_stream. Chunks are
+        handed from the pool's event loop to the calling thread through a queue.
+        """
+        items = queue.Queue()
+        done = object()
+        self._submit(self._pump_stream(query, items, done))
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def _close(self):
+        sessions, self._sessions = list(self._sessions), set()
+        await asyncio.gather(*(session.close() for session in sessions))
+
+    def close(self):
+        self._submit(self._close()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
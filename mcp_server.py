@@ -1,17 +1,17 @@
 # mcp_server.py
 import asyncio
+import importlib
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import sys
 import os
+import time
 from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
 import mcp.server.stdio
 import mcp.types as types
-from report import generate_sales_analysis_report as gsar
-from data_display import display_database as dd
-from aws_s3_read import get_s3_structure_string
-from aws_file_index import index_s3_text_files as indexs
-from generate_response import generate_reasoning_and_graph as reasoning
+from tool_registry import ToolRegistry, ToolSpec
 
 from dotenv import load_dotenv
 
@@ -23,54 +23,264 @@ AWS_SECRET = os.getenv("aws_secret_key_l")
 AWS_REGION = os.getenv("region_name_l")
 PREFIX = os.getenv("prefix_l")
 
+# Blocking tool implementations run on this pool so the stdio event loop stays responsive
+TOOL_WORKERS = int(os.getenv("MCP_TOOL_WORKERS", "16"))
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="mcp-tool")
+registry = ToolRegistry(tool_executor)
+
+# Seconds an S3 listing is reused for repeated get-incident_files calls
+INCIDENT_FILES_TTL = float(os.getenv("MCP_INCIDENT_FILES_TTL", "60"))
+
+# Import the tool modules (and open the sales pool) in the background once the client has initialized
+WARM_UP = os.getenv("MCP_WARM_UP", "1") == "1"
+
+def resolve(module, attr):
+    """module.attr (attr may be dotted), importing the module on first use."""
+    target = importlib.import_module(module)
+    for part in attr.split("."):
+        target = getattr(target, part)
+    return target
+
+def lazy(module, attr):
+    """
+    A stand-in for module.attr that imports the module when first called, so the tool
+    modules and their dependencies (boto3, openai, numpy, tiktoken, pdfminer) load on a
+    tool worker thread when needed rather than before the handshake.
+    """
+    def call(*args, **kwargs):
+        return resolve(module, attr)(*args, **kwargs)
+    return call
+
+generate_report = lazy("report_cache", "report_cache.get")
+describe_schema = lazy("data_display", "describe_schema")
+dd = lazy("data_display", "display_database")
+get_s3_structure_string = lazy("aws_s3_read", "get_s3_structure_string")
+indexs = lazy("aws_file_index", "index_s3_text_files")
+
 # Create server instance
 server = Server("mcp-server")
 
+def progress_reporter():
+    """
+    Async progress(progress, total) callback for the current request, or None when the
+    client did not send a progress token.
+    """
+    ctx = server.request_context
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+
+    async def report(progress, total=None):
+        await ctx.session.send_progress_notification(token, progress, total)
+    return report
+
+def collect_metrics():
+    """Hit/miss counters of the server's caches; None for a cache whose module is not loaded yet."""
+    loaded = sys.modules
+    completion_cache = loaded["llm_cache"].get_completion_cache() if "llm_cache" in loaded else None
+    return {
+        "report_cache": loaded["report_cache"].report_cache.stats() if "report_cache" in loaded else None,
+        "index_cache": loaded["index_cache"].index_cache.stats() if "index_cache" in loaded else None,
+        "llm_cache": completion_cache.stats() if completion_cache is not None else None,
+        "tool_results": registry.stats(),
+    }
+
+def warm_up():
+    """
+    Import the modules of the tools this server exposes, and open the sales database pool
+    and schema if it serves the sales tools, ahead of the first call.
+    """
+    start = time.perf_counter()
+    modules = registry.warm_modules()
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"[Warm-up] Could not import {module}: {e}", file=sys.stderr)
+    if "data_display" in modules:
+        try:
+            resolve("data_display", "get_schema")()
+        except Exception as e:
+            print(f"[Warm-up] Sales database not ready: {e}", file=sys.stderr)
+    print(f"[Warm-up] Done in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+_warm_up_started = False
+
+async def handle_initialized(notification):
+    """Start the warm-up, once per process, without holding up the session."""
+    global _warm_up_started
+    if WARM_UP and not _warm_up_started:
+        _warm_up_started = True
+        asyncio.get_running_loop().run_in_executor(tool_executor, warm_up)
+
+server.notification_handlers[types.InitializedNotification] = handle_initialized
+
+# Tool handlers: each takes the call arguments and returns the result text
+
+async def get_datetime(arguments):
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"Current date and time: {current_time}"
+
+def get_salereport(arguments):
+    # Served from the report cache while the sales tables are unchanged
+    return f"📊 Sales Report:\n{generate_report()}"
+
+def get_server_metrics(arguments):
+    return f"📈 Server Metrics:\n{json.dumps(collect_metrics(), indent=2)}"
+
+def get_database_schema(arguments):
+    return f"🗃 Database Schema:\n{describe_schema()}"
+
+def get_database_data(arguments):
+    data = dd(
+        table=arguments.get("table"),
+        columns=arguments.get("columns"),
+        filters=arguments.get("filters"),
+        limit=arguments.get("limit", 100),
+        cursor=arguments.get("cursor"),
+        fmt=arguments.get("format", "csv")
+    )
+    return f"📚 Database Data:\n{data}"
+
+def get_incident_files(arguments):
+    #print('Connecting to AWS S3...')
+    files = get_s3_structure_string(
+        bucket_name=BUCKET_NAME,
+        aws_access_key=AWS_KEY,
+        aws_secret_key=AWS_SECRET,
+        region_name=AWS_REGION,
+        prefix=PREFIX
+    )
+    return f"🗂 Incident Files:\n{files}"
+
+def get_aws_s3_file_indexing(arguments, progress):
+    #print('Check indexing or create indexing...')
+    indexing_result = indexs(
+        bucket_name=BUCKET_NAME,
+        aws_access_key=AWS_KEY,
+        aws_secret_key=AWS_SECRET,
+        region_name=AWS_REGION,
+        prefix=PREFIX,
+        progress=progress
+    )
+    return (f"✅ S3 files indexed successfully. {indexing_result['indexed']} indexed, "
+            f"{indexing_result['pruned']} pruned, {indexing_result['total']} total.")
+
+async def get_reasoning_output(arguments, progress):
+    query = arguments.get("query", "No query provided.")
+    include_graph = arguments.get("include_graph", True)
+    #print('Reasoning start!...')
+    # Native async: retrieval runs in a thread, the two completions run concurrently
+    areasoning = await asyncio.get_running_loop().run_in_executor(
+        tool_executor, resolve, "generate_response", "agenerate_reasoning_and_graph")
+    summary, graph = await areasoning(query, include_graph=include_graph, progress=progress)
+    #return f"🗺 Note Graph JSON:\n{graph}"
+    return f"🧠 Reasoning Summary:\n{summary[0:3000]}..."
+
+# Indexing is exclusive (concurrency 1) because it writes the index store; it and the
+# reasoning call have no timeout as their run time grows with the bucket and the model.
+# The warm-up imports each exposed tool's warm_modules in this order, so the slow
+# reasoning stack comes last.
+TOOLS = [
+    ToolSpec(
+        name="get-datetime",
+        description="Get the current date and time",
+        handler=get_datetime,
+        is_async=True
+    ),
+    ToolSpec(
+        name="get-salereport",
+        description="Generate a sales analysis report from the database.",
+        handler=get_salereport,
+        timeout=120,
+        warm_modules=("report_cache",)
+    ),
+    ToolSpec(
+        name="get-server_metrics",
+        description="Cache hit/miss metrics for this server (sales report, document index, LLM completions, tool results).",
+        handler=get_server_metrics,
+        timeout=10
+    ),
+    ToolSpec(
+        name="get-database_schema",
+        description="List the tables and summaries in the internal system database with their columns.",
+        handler=get_database_schema,
+        timeout=30,
+        warm_modules=("data_display",)
+    ),
+    ToolSpec(
+        name="get-database_data",
+        description=(
+            "Read one page of rows from a table or summary of the internal system database "
+            "(customers, products, orders, order_items, customer_orders_summary, product_sales_summary). "
+            "Returns CSV or JSON lines with the row count and a cursor for the next page."
+        ),
+        handler=get_database_data,
+        input_schema={
+            "type": "object",
+            "properties": {
+                "table": {"type": "string", "description": "Table or summary name."},
+                "columns": {"type": "array", "items": {"type": "string"}, "description": "Columns to return (default all)."},
+                "filters": {
+                    "type": "object",
+                    "description": 'Column conditions, e.g. {"status": "Shipped", "total_amount": {"op": ">=", "value": 100}}.'
+                },
+                "limit": {"type": "integer", "description": "Rows per page (default 100, max 1000)."},
+                "cursor": {"type": "string", "description": "next_cursor from the previous page."},
+                "format": {"type": "string", "enum": ["csv", "jsonl"]}
+            },
+            "required": ["table"]
+        },
+        timeout=60,
+        warm_modules=("data_display",)
+    ),
+    ToolSpec(
+        name="get-incident_files",
+        description="List aircraft incident PDF files from S3.",
+        handler=get_incident_files,
+        timeout=60,
+        cache_ttl=INCIDENT_FILES_TTL,
+        warm_modules=("aws_s3_read",)
+    ),
+    ToolSpec(
+        name="get-aws_s3_file_indexing",
+        description="Index the S3 incident files for chunk-level keyword and topic extraction.",
+        handler=get_aws_s3_file_indexing,
+        concurrency=1,
+        progress=True,
+        warm_modules=("aws_file_index",)
+    ),
+    ToolSpec(
+        name="get-reasoning_output",
+        description="Generate a reasoning summary and note-graph based on a query over indexed S3 content for aircraft incident.",
+        handler=get_reasoning_output,
+        input_schema={
+            "type": "object",
+            "properties": {
+                "query": {"type": "string"},
+                "include_graph": {
+                    "type": "boolean",
+                    "description": "Also build the note graph shown in the UI (default true).",
+                    "default": True
+                }
+            },
+            "required": ["query"]
+        },
+        is_async=True,
+        progress=True,
+        warm_modules=("generate_response",)
+    ),
+]
+
+# Comma-separated tool names this server exposes (default all), so a coordinator can run
+# this script as several plugin servers, e.g. one for S3/RAG and one for the sales database
+SERVER_TOOLS = [name.strip() for name in os.getenv("MCP_SERVER_TOOLS", "").split(",") if name.strip()]
+registry.register(*(spec for spec in TOOLS if not SERVER_TOOLS or spec.name in SERVER_TOOLS))
+
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """List available tools"""
-    return [
-        types.Tool(
-            name="get-datetime",
-            description="Get the current date and time",
-            inputSchema={
-                "type": "object",
-                "properties": {},  # No input needed
-                "required": []
-            }
-        ),
-        types.Tool(
-            name="get-salereport",
-            description="Generate a sales analysis report from the database.",
-            inputSchema={"type": "object", "properties": {}, "required": []}
-        ),
-        types.Tool(
-            name="get-database_data",
-            description="Display all available data from internal system database.",
-            inputSchema={"type": "object", "properties": {}, "required": []}
-        ),
-        types.Tool(
-            name="get-incident_files",
-            description="List aircraft incident PDF files from S3.",
-            inputSchema={"type": "object", "properties": {}, "required": []}
-        ),
-        types.Tool(
-            name="get-aws_s3_file_indexing",
-            description="Index the S3 incident files for chunk-level keyword and topic extraction.",
-            inputSchema={"type": "object", "properties": {}, "required": []}
-        ),
-        types.Tool(
-            name="get-reasoning_output",
-            description="Generate a reasoning summary and note-graph based on a query over indexed S3 content for aircraft incident.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string"}
-                },
-                "required": ["query"]
-            }
-        )
-    ]
+    return registry.tools
 
 @server.call_tool()
 async def handle_call_tool(
@@ -78,55 +288,17 @@ async def handle_call_tool(
     arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
     """Handle tool execution"""
-    if name == "get-datetime":
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        return [
-            types.TextContent(
-                type="text",
-                text=f"Current date and time: {current_time}"
-            )
-        ]
-    if name == "get-salereport":
-        report = gsar()
-        return [types.TextContent(type="text", text=f"📊 Sales Report:\n{report}")]
-
-    if name == "get-database_data":
-        data = dd()
-        return [types.TextContent(type="text", text=f"📚 Database Data:\n{data}")]
-    
-    if name == "get-incident_files":
-        #print('Connecting to AWS S3...')
-        files = get_s3_structure_string(
-            bucket_name=BUCKET_NAME,
-            aws_access_key=AWS_KEY,
-            aws_secret_key=AWS_SECRET,
-            region_name=AWS_REGION,
-            prefix=PREFIX
-        )
-        return [types.TextContent(type="text", text=f"🗂 Incident Files:\n{files}")]
-
-    if name == "get-aws_s3_file_indexing":
-        #print('Check indexing or create indexing...')
-        indexing_result = indexs(
-            bucket_name=BUCKET_NAME,
-            aws_access_key=AWS_KEY,
-            aws_secret_key=AWS_SECRET,
-            region_name=AWS_REGION,
-            prefix=PREFIX
-        )
-        return [types.TextContent(type="text", text="✅ S3 files indexed successfully.")]    
-
-    if name == "get-reasoning_output":
-        query = arguments.get("query", "No query provided.")
-        #print('Reasoning start!...')
-        summary, graph = reasoning(query)
-        summary = reasoning(query)
-        return [
-            types.TextContent(type="text", text=f"🧠 Reasoning Summary:\n{summary[0:3000]}...")
-            #types.TextContent(type="text", text=f"🗺 Note Graph JSON:\n{graph}")
-        ]    
+    return await registry.call(name, arguments, progress=progress_reporter)
 
-    raise ValueError(f"Unknown tool: {name}")
+def initialization_options():
+    return InitializationOptions(
+        server_name="mcp-server",
+        server_version="0.1.0",
+        capabilities=server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
+        ),
+    )
 
 async def main():
     """Run the server"""
@@ -140,15 +312,90 @@ async def main():
         await server.run(
             read_stream,
             write_stream,
-            InitializationOptions(
-                server_name="mcp-server",
-                server_version="0.1.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
-                ),
-            )
+            initialization_options()
         )
 
+# Seconds between checks for SSE clients that have disconnected
+SSE_DISCONNECT_POLL = 1.0
+
+def create_sse_app():
+    """
+    Starlette app serving MCP over HTTP with SSE: GET /sse opens a session and streams the
+    server's messages, POST /messages/?session_id=... delivers the client's. Every session
+    shares this process's tool executor, caches, database pool and OpenAI clients.
+    """
+    import anyio
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            async with anyio.create_task_group() as tg:
+                async def close_on_disconnect():
+                    # The SSE transport does not end the session when its client goes away
+                    while not await request.is_disconnected():
+                        await anyio.sleep(SSE_DISCONNECT_POLL)
+                    tg.cancel_scope.cancel()
+
+                tg.start_soon(close_on_disconnect)
+                await server.run(read_stream, write_stream, initialization_options())
+                tg.cancel_scope.cancel()
+        # The SSE response has already been sent; Starlette still expects one from the endpoint
+        return Response()
+
+    return Starlette(routes=[
+        Route("/sse", endpoint=handle_sse),
+        Mount("/messages/", app=sse.handle_post_message),
+    ])
+
+def serve_sse(host, port):
+    import uvicorn
+    print(f"[MCP Server] Serving SSE on http://{host}:{port}/sse", file=sys.stderr)
+    # Open SSE streams never finish on their own, so shutdown only waits this long for them
+    uvicorn.run(create_sse_app(), host=host, port=port, log_level="warning", timeout_graceful_shutdown=5)
+
+def serve_sse_workers(host, port, workers):
+    """
+    Run workers server processes on ports port .. port + workers - 1. An SSE session lives
+    in the memory of the process that opened it, and its POSTs go back to the same host and
+    port, so each worker listens on its own port: sessions stay on one worker, and clients
+    (or a front proxy) spread sessions across the ports.
+    """
+    import multiprocessing
+    import signal
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    processes = [
+        multiprocessing.Process(target=serve_sse, args=(host, port + i), name=f"mcp-sse-{i}")
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            process.terminate()
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MCP server for the sales database and S3 incident documents.")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default=os.getenv("MCP_TRANSPORT", "stdio"))
+    parser.add_argument("--host", default=os.getenv("MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MCP_WORKERS", "1")),
+                        help="SSE server processes, on consecutive ports from --port")
+    args = parser.parse_args()
+
+    if args.transport == "stdio":
+        asyncio.run(main())
+    elif args.workers > 1:
+        serve_sse_workers(args.host, args.port, args.workers)
+    else:
+        serve_sse(args.host, args.port)
@@ -0,0 +1,153 @@
+"""
+PDF text extraction for the indexer. Kept in a light module so process-pool workers only
+import pdfminer, not the OpenAI/boto3 stack of the indexer.
+
+A document is spooled to a temporary file and read one page at a time, so memory follows
+the largest page rather than the size of the document. extract_pages yields the text of
+each page; extract_pages_parallel walks the page tree once, hands ranges of page object
+ids to worker processes, which look their pages up directly, and yields the pages in
+order. Joined, the pages equal pdfminer's extract_text output for the file.
+"""
+import os
+import shutil
+import tempfile
+from collections import deque
+from io import StringIO
+from itertools import islice
+
+SPOOL_DIR = os.getenv("INDEX_SPOOL_DIR") or None
+SPOOL_CHUNK_BYTES = 1024 * 1024
+# Pages extracted per worker task
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+
+def spool_to_file(stream, suffix=".pdf"):
+    """Copy a readable stream (e.g. an S3 StreamingBody) to a temporary file in chunks. Returns the path; the caller removes it."""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(stream, f, SPOOL_CHUNK_BYTES)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _open_document(fp):
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+
+    # caching=False: parsed objects (page images of scans included) are not kept for the whole document
+    return PDFDocument(PDFParser(fp), caching=False)
+
+
+def page_ids(path):
+    """Object ids of the pages of the PDF at path, in order, from one walk of the page tree."""
+    from pdfminer.pdfpage import PDFPage
+
+    with open(path, "rb") as fp:
+        return [page.pageid for page in PDFPage.create_pages(_open_document(fp))]
+
+
+def _inherited_attrs(document, node, cache):
+    """
+    The inheritable attributes a /Pages node passes to its kids: its own, then its
+    ancestors', then the catalog's (as PDFPage.create_pages inherits them on its walk).
+    cache holds them per node object id, so a node is parsed once per task.
+    """
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import dict_value
+
+    objid = getattr(node, "objid", None)
+    if objid in cache:
+        return cache[objid]
+    if objid is not None:
+        cache[objid] = {}  # stops a /Parent cycle
+    attrs = dict_value(node)
+    inherited = {name: attrs[name] for name in PDFPage.INHERITABLE_ATTRS if name in attrs}
+    above = attrs.get("Parent")
+    above = _inherited_attrs(document, above, cache) if above is not None else document.catalog
+    for name in PDFPage.INHERITABLE_ATTRS:
+        if name not in inherited and name in above:
+            inherited[name] = above[name]
+    if objid is not None:
+        cache[objid] = inherited
+    return inherited
+
+
+def _load_page(document, objid, cache):
+    """The PDFPage with object id objid, looked up directly instead of walking the pages before it."""
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import dict_value
+
+    attrs = dict_value(document.getobj(objid)).copy()
+    parent = attrs.get("Parent")
+    inherited = _inherited_attrs(document, parent, cache) if parent is not None else document.catalog
+    for name in PDFPage.INHERITABLE_ATTRS:
+        if name not in attrs and name in inherited:
+            attrs[name] = inherited[name]
+    return PDFPage(document, objid, attrs, None)
+
+
+def _page_texts(pages):
+    """Yield the text of each PDFPage in pages; the document's file must stay open meanwhile."""
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+    output = StringIO()
+    resources = PDFResourceManager(caching=True)
+    converter = TextConverter(resources, output, laparams=LAParams())
+    try:
+        interpreter = PDFPageInterpreter(resources, converter)
+        for page in pages:
+            interpreter.process_page(page)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    finally:
+        converter.close()
+
+
+def extract_pages(path):
+    """Yield the text of every page of the PDF at path, in order."""
+    from pdfminer.pdfpage import PDFPage
+
+    with open(path, "rb") as fp:
+        yield from _page_texts(PDFPage.create_pages(_open_document(fp)))
+
+
+def extract_page_range(path, objids):
+    """The texts of the pages with the given object ids, as a list; runs in a worker process."""
+    with open(path, "rb") as fp:
+        document = _open_document(fp)
+        cache = {}
+        return list(_page_texts(_load_page(document, objid, cache) for objid in objids))
+
+
+def extract_pages_parallel(path, pool=None, pages_per_task=PAGES_PER_TASK, window=None):
+    """
+    Yield the text of every page of the PDF at path, in order. With a process pool, ranges
+    of pages_per_task pages are extracted by the pool's workers (a short document is one
+    task), with at most `window` ranges (default: CPU count) submitted ahead of the
+    consumer, so memory stays bounded however long the document is.
+    """
+    if pool is None:
+        yield from extract_pages(path)
+        return
+
+    objids = page_ids(path)
+    ranges = (objids[start:start + pages_per_task] for start in range(0, len(objids), pages_per_task))
+    window = window or os.cpu_count() or 2
+    pending = deque()
+    try:
+        for objid_range in islice(ranges, window):
+            pending.append(pool.submit(extract_page_range, path, objid_range))
+        while pending:
+            pages = pending.popleft().result()
+            for objid_range in islice(ranges, 1):
+                pending.append(pool.submit(extract_page_range, path, objid_range))
+            yield from pages
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,150 @@
+"""
+Query plan audit for the online_sales report and data display queries.
+
+    python plan_audit.py [--db online_sales.db] [--verbose]
+
+Runs EXPLAIN QUERY PLAN over every query report.py and data_display.py issue and flags
+full table scans (a SCAN of a table that uses no index) and automatic indexes on tables,
+which SQLite builds when an index is missing. Scans of CTEs and subqueries are not
+flagged, nor is the rowid-ordered scan that starts a first page, since it stops after
+LIMIT rows. Without --db the audit runs against a fresh database built by
+database_creation.create_schema, so it checks the schema builder itself. Exits with
+status 1 when anything is flagged.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+import data_display
+import report
+from database_creation import create_schema
+from sales_aggregates import RECOMPUTE, install_aggregates
+
+# Tables a query may read in full because every row is part of the answer (products are
+# all listed in the product sections) or because the table is a small aggregate
+ALLOWED_SCANS = {"products", "agg_order_status", "agg_payment_method", "agg_product_sales"}
+
+_PLAN_TARGET = re.compile(r"^(SCAN|SEARCH) (\S+)(.*)$")
+_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+
+
+def audited_queries(db_path):
+    """
+    (name, sql, params, paged) for every report query, with and without the aggregates,
+    and for the data display pages. paged marks queries that stop after a LIMIT.
+    """
+    schema = data_display.get_schema(db_path)
+    report_params = {"top_n": report.TOP_N, "low_stock": report.LOW_STOCK_THRESHOLD}
+    queries = [
+        ("report: order breakdown", report.ORDER_BREAKDOWN_SQL, {}, False),
+        ("report: product rollup", report.PRODUCT_ROLLUP_SQL.format(sales=report.SALES_FROM_ITEMS),
+         report_params, False),
+        ("report: customer states", report.CUSTOMER_STATES_SQL, {}, False),
+        ("report: top customers", report.TOP_CUSTOMERS_SQL.format(spend=report.SPEND_FROM_ORDERS),
+         report_params, False),
+    ]
+    aggregate_queries = [
+        ("report (aggregates): order status", report.AGG_STATUS_SQL, {}, False),
+        ("report (aggregates): payment methods", report.AGG_PAYMENT_SQL, {}, False),
+        ("report (aggregates): product rollup",
+         report.PRODUCT_ROLLUP_SQL.format(sales=report.SALES_FROM_AGGREGATES), report_params, False),
+        ("report (aggregates): top customers",
+         report.TOP_CUSTOMERS_SQL.format(spend=report.SPEND_FROM_AGGREGATES), report_params, False),
+    ]
+    if all(table in schema for table, _, _, _ in RECOMPUTE):
+        queries.extend(aggregate_queries)
+
+    for table in schema:
+        if table.startswith("agg_"):
+            continue
+        next_cursor = data_display._encode_cursor([1] * len(data_display.page_key(table)))
+        for label, cursor in (("first page", None), ("next page", next_cursor)):
+            sql, params, _ = data_display.page_query(schema, table, cursor=cursor)
+            queries.append((f"get-database_data {table}: {label}", sql, params + [data_display.DEFAULT_LIMIT], True))
+
+    # The summaries as they read without the aggregate tables
+    for name, summary in data_display.SUMMARY_QUERIES.items():
+        keys = data_display.page_key(name)
+        sql = (f"SELECT * FROM ({summary['sql']}) WHERE ({', '.join(keys)}) > ({', '.join('?' * len(keys))}) "
+               f"ORDER BY {', '.join(keys)} LIMIT ?")
+        queries.append((f"get-database_data {name} (no aggregates): next page", sql,
+                        [1] * len(keys) + [data_display.DEFAULT_LIMIT], True))
+    return queries
+
+
+def audit_query(conn, sql, params, paged=False):
+    """EXPLAIN QUERY PLAN one query. Returns (plan lines, flagged problems)."""
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    aliases = {alias: table for table, alias in _ALIAS.findall(sql)}
+    # A LIMITed page whose order comes straight from its driving scan reads only LIMIT rows
+    early_exit = paged and not any("TEMP B-TREE FOR ORDER BY" in detail for detail in plan)
+    problems = []
+    for detail in plan:
+        match = _PLAN_TARGET.match(detail)
+        if not match:
+            continue
+        op, name, rest = match.groups()
+        table = aliases.get(name, name)
+        if table not in tables:
+            continue
+        if "AUTOMATIC" in rest:
+            problems.append(f"missing index on {table}: {detail}")
+        elif op == "SCAN" and "INDEX" not in rest and table not in ALLOWED_SCANS:
+            if early_exit:
+                early_exit = False
+            else:
+                problems.append(f"full table scan of {table}: {detail}")
+    return plan, problems
+
+
+def audit(db_path):
+    """{query name: (plan lines, problems)} for every audited query."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return {name: audit_query(conn, sql, params, paged) for name, sql, params, paged in audited_queries(db_path)}
+    finally:
+        conn.close()
+
+
+def _fresh_database(path):
+    conn = sqlite3.connect(path)
+    try:
+        create_schema(conn.cursor())
+        install_aggregates(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="audit an existing database instead of a fresh schema")
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only flagged ones")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, "plan_audit.db")
+            _fresh_database(db_path)
+        results = audit(db_path)
+
+    flagged = 0
+    for name, (plan, problems) in results.items():
+        if problems or args.verbose:
+            print(f"{'FLAG' if problems else 'ok  '} {name}")
+            for detail in plan:
+                print(f"       {detail}")
+            for problem in problems:
+                print(f"    -> {problem}")
+        flagged += bool(problems)
+    print(f"[Plan Audit] {len(results)} queries, {flagged} flagged")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
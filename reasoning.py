@@ -1,25 +1,22 @@
 import streamlit as st
-import asyncio
 import json
 import os
-from mcp_client import MCPClient
+from mcp_pool import MCPClientPool
 from pyvis.network import Network
 import streamlit.components.v1 as components
 
+@st.cache_resource
+def get_mcp_pool():
+    # One pool of warm MCP server sessions shared by every Streamlit session
+    return MCPClientPool(server_path="./mcp_server.py")
+
 def process_user_query(query: str) -> str:
-    # Run the async process_query function and return its result.
-    return asyncio.run(process_query(query))
+    # Route the query to an idle pooled session and wait for its result.
+    return get_mcp_pool().process_query(query)
 
-async def process_query(query: str) -> str:
-    # Create a new client instance
-    client = MCPClient()
-    try:
-        server_path = "./mcp_server.py"
-        await client.connect_to_server(server_path)
-        result = await client.process_query(query)
-        return result
-    finally:
-        await client.cleanup()
+def stream_user_query(query: str):
+    # Same as process_user_query, but yields the answer as it is generated.
+    return get_mcp_pool().stream_query(query)
 
 def load_note_graph(filename="note_graph.json"):
     """Load note graph JSON data if available."""
@@ -77,13 +74,16 @@ def main():
         user_query = st.text_input("Your Query:")
         submit_button = st.form_submit_button(label="Send Query")
 
+    streamed = False
     if submit_button and user_query:
         st.info("Processing query...")
-        response = process_user_query(user_query)
-        st.session_state["response"] = response
+        # Render tokens and tool progress as they arrive instead of waiting for the full answer
+        response = st.write_stream(stream_user_query(user_query))
+        st.session_state["response"] = response if isinstance(response, str) else "".join(map(str, response))
+        streamed = True
 
-    # Always display the response if it exists.
-    if st.session_state["response"]:
+    # Display the previous response on reruns; a freshly streamed one is already on screen.
+    if st.session_state["response"] and not streamed:
         st.text_area("Response", value=st.session_state["response"], height=300)
 
     # Button to show the interactive reasoning graph.
@@ -1,192 +1,287 @@
-import sqlite3
-import pandas as pd
 from datetime import datetime
 
-def generate_sales_analysis_report(db_path='online_sales.db'):
+from sales_aggregates import aggregates_installed
+from sales_db import read_connection
+
+LOW_STOCK_THRESHOLD = 50
+TOP_N = 5
+
+# One grouped scan of orders covers the overall summary, status and payment method sections
+# (windows over the grouped rows roll each status up without another pass)
+ORDER_BREAKDOWN_SQL = """
+    SELECT status, payment_method, COUNT(*) AS order_count, SUM(total_amount) AS revenue,
+           ROUND(SUM(SUM(total_amount)) OVER (PARTITION BY status)
+                 / SUM(COUNT(*)) OVER (PARTITION BY status), 2) AS status_avg
+    FROM orders
+    GROUP BY status, payment_method
+"""
+
+# With the trigger-maintained aggregates the same sections are read without touching orders
+AGG_STATUS_SQL = """
+    SELECT NULLIF(status, ''), order_count, revenue, ROUND(revenue / order_count, 2)
+    FROM agg_order_status
+"""
+AGG_PAYMENT_SQL = "SELECT NULLIF(payment_method, ''), order_count, revenue FROM agg_payment_method"
+
+SALES_FROM_ITEMS = """(
+    SELECT product_id, SUM(quantity) AS units_sold, SUM(quantity * price_per_unit) AS revenue
+    FROM order_items
+    GROUP BY product_id
+)"""
+# The aggregate table is joined directly, so each product is a primary key lookup
+SALES_FROM_AGGREGATES = "agg_product_sales"
+
+# One scan of order_items (or agg_product_sales) and one of products. The per-product CTE
+# is referenced three times, so SQLite materializes it once and every product section is
+# read from it.
+PRODUCT_ROLLUP_SQL = """
+    WITH product_sales AS (
+        SELECT p.name, p.category, p.price, p.stock_quantity, s.units_sold, s.revenue,
+               ROW_NUMBER() OVER (ORDER BY s.revenue DESC) AS revenue_rank
+        FROM products p
+        LEFT JOIN {sales} s ON s.product_id = p.product_id
+    )
+    SELECT 'category', category, NULL, NULL, COUNT(*), SUM(units_sold), SUM(revenue),
+           SUM(stock_quantity), MIN(stock_quantity), MAX(stock_quantity)
+    FROM product_sales GROUP BY category
+    UNION ALL
+    SELECT 'top', category, name, price, revenue_rank, units_sold, revenue, stock_quantity, NULL, NULL
+    FROM product_sales WHERE revenue_rank <= :top_n AND revenue IS NOT NULL
+    UNION ALL
+    SELECT 'low_stock', category, name, price, NULL, NULL, NULL, stock_quantity, NULL, NULL
+    FROM product_sales WHERE stock_quantity < :low_stock
+"""
+
+CUSTOMER_STATES_SQL = """
+    SELECT state, COUNT(*) AS customer_count
+    FROM customers
+    GROUP BY state
+    ORDER BY customer_count DESC
+"""
+
+# Rank customers on orders alone and join names for the top rows only
+SPEND_FROM_ORDERS = """
+    SELECT customer_id, COUNT(*) AS order_count, SUM(total_amount) AS total_spent
+    FROM orders
+    GROUP BY customer_id
+"""
+SPEND_FROM_AGGREGATES = "SELECT customer_id, order_count, total_spent FROM agg_customer_spend"
+
+TOP_CUSTOMERS_SQL = """
+    WITH spend AS (
+        {spend}
+        ORDER BY total_spent DESC
+        LIMIT :top_n
+    )
+    SELECT c.first_name || ' ' || c.last_name, s.order_count, s.total_spent,
+           s.total_spent / s.order_count
+    FROM spend s
+    JOIN customers c ON c.customer_id = s.customer_id
+    ORDER BY s.total_spent DESC
+"""
+
+
+def _order_section(conn, use_aggregates):
+    """Order totals with status and payment method breakdowns, as plain tuples."""
+    if use_aggregates:
+        status_rows = conn.execute(AGG_STATUS_SQL).fetchall()
+        payment_rows = conn.execute(AGG_PAYMENT_SQL).fetchall()
+    else:
+        by_status, by_payment = {}, {}
+        for status, payment_method, count, revenue, status_avg in conn.execute(ORDER_BREAKDOWN_SQL):
+            for groups, key in ((by_status, status), (by_payment, payment_method)):
+                group = groups.setdefault(key, [0, 0.0, status_avg])
+                group[0] += count
+                group[1] += revenue or 0.0
+        status_rows = [(k, c, r, avg) for k, (c, r, avg) in by_status.items()]
+        payment_rows = [(k, c, r) for k, (c, r, _) in by_payment.items()]
+    return {
+        "order_count": sum(row[1] for row in status_rows),
+        "revenue": sum(row[2] for row in status_rows),
+        # (status, orders, revenue, average) and (payment method, orders, revenue), largest first
+        "status": sorted(status_rows, key=lambda row: (-row[1], str(row[0]))),
+        "payment": sorted(payment_rows, key=lambda row: (-row[2], str(row[0]))),
+    }
+
+
+def _product_section(conn, use_aggregates):
+    """Categories, top products, category sales, inventory and low stock from one statement."""
+    categories, top, low_stock = [], [], []
+    params = {"top_n": TOP_N, "low_stock": LOW_STOCK_THRESHOLD}
+    sql = PRODUCT_ROLLUP_SQL.format(sales=SALES_FROM_AGGREGATES if use_aggregates else SALES_FROM_ITEMS)
+    rows = conn.execute(sql, params)
+    for kind, category, name, price, n, units_sold, revenue, stock, min_stock, max_stock in rows:
+        if kind == "category":
+            categories.append((category, n, units_sold, revenue, stock, min_stock, max_stock))
+        elif kind == "top":
+            top.append((n, name, category, price, units_sold, revenue))
+        else:
+            low_stock.append((name, category, stock, price))
+
+    product_count = sum(row[1] for row in categories)
+    stocked = [row for row in categories if row[4] is not None]
+    return {
+        "categories": sorted(((row[0], row[1]) for row in categories), key=lambda row: (-row[1], str(row[0]))),
+        "category_sales": sorted(((row[0], row[2], row[3]) for row in categories if row[3] is not None),
+                                 key=lambda row: -row[2]),
+        "top": [row[1:] for row in sorted(top)],
+        "inventory": (
+            sum(row[4] for row in stocked),
+            sum(row[4] for row in stocked) / product_count if product_count else 0.0,
+            min((row[5] for row in stocked), default=0),
+            max((row[6] for row in stocked), default=0),
+        ),
+        "low_stock": sorted(low_stock, key=lambda row: row[2]),
+    }
+
+
+def _customer_section(conn, use_aggregates):
+    states = conn.execute(CUSTOMER_STATES_SQL).fetchall()
+    sql = TOP_CUSTOMERS_SQL.format(spend=SPEND_FROM_AGGREGATES if use_aggregates else SPEND_FROM_ORDERS)
+    return {
+        "customer_count": sum(count for _, count in states),
+        "states": states,
+        "top": conn.execute(sql, {"top_n": TOP_N}).fetchall(),
+    }
+
+
+# Report sections: name -> (compute function, source tables the section reads)
+REPORT_SECTIONS = {
+    "orders": (_order_section, ("orders",)),
+    "products": (_product_section, ("products", "order_items")),
+    "customers": (_customer_section, ("customers", "orders")),
+}
+
+
+def compute_report_data(conn, use_aggregates=None, sections=None):
     """
-    Generate a comprehensive sales analysis report from the online sales database.
-    Returns the report as a formatted text string.
+    Report sections as plain tuples (all of them unless `sections` names some). When the
+    sales_aggregates tables are installed (the default is to detect them) orders and
+    order_items are not read at all; otherwise order_items, products and customers are
+    scanned once each and orders twice.
     """
-    # Connect to the database
-    conn = sqlite3.connect(db_path)
-    
-    # Helper function to run SQL queries and return pandas DataFrames
-    def run_query(query):
-        return pd.read_sql_query(query, conn)
-    
-    # Start building the report
+    if use_aggregates is None:
+        use_aggregates = aggregates_installed(conn)
+    return {name: compute(conn, use_aggregates)
+            for name, (compute, _) in REPORT_SECTIONS.items()
+            if sections is None or name in sections}
+
+
+def format_report(data, generated_at=None):
+    """Render the report text from compute_report_data() output."""
+    orders, products, customers = data["orders"], data["products"], data["customers"]
+    generated_at = generated_at or datetime.now()
+
     report_lines = []
     report_lines.append("=" * 80)
     report_lines.append(f"ONLINE SALES DATABASE ANALYSIS REPORT")
-    report_lines.append(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report_lines.append(f"Generated on: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}")
     report_lines.append("=" * 80)
-    
+
     # 1. Overall Sales Summary
     report_lines.append("\n1. OVERALL SALES SUMMARY")
     report_lines.append("-" * 30)
-    
-    # Total orders and revenue
-    total_sales = run_query("SELECT COUNT(*) as order_count, SUM(total_amount) as total_revenue FROM orders")
-    report_lines.append(f"Total Orders: {total_sales['order_count'].iloc[0]}")
-    report_lines.append(f"Total Revenue: ${total_sales['total_revenue'].iloc[0]:.2f}")
-    
-    # Average order value
-    report_lines.append(f"Average Order Value: ${total_sales['total_revenue'].iloc[0] / total_sales['order_count'].iloc[0]:.2f}")
-    
-    # Order status breakdown
-    status_breakdown = run_query("""
-        SELECT status, COUNT(*) as count, SUM(total_amount) as total_amount,
-        ROUND(AVG(total_amount), 2) as avg_amount
-        FROM orders GROUP BY status ORDER BY count DESC
-    """)
-    
+    order_count = orders["order_count"]
+    report_lines.append(f"Total Orders: {order_count}")
+    report_lines.append(f"Total Revenue: ${orders['revenue']:.2f}")
+    report_lines.append(f"Average Order Value: ${orders['revenue'] / order_count if order_count else 0.0:.2f}")
+
     report_lines.append("\nOrder Status Breakdown:")
-    for _, row in status_breakdown.iterrows():
-        report_lines.append(f"  {row['status']}: {row['count']} orders, ${row['total_amount']:.2f} total, ${row['avg_amount']} avg")
-    
+    for status, count, total, avg_amount in orders["status"]:
+        report_lines.append(f"  {status}: {count} orders, ${total:.2f} total, ${avg_amount} avg")
+
     # 2. Product Analysis
     report_lines.append("\n\n2. PRODUCT ANALYSIS")
     report_lines.append("-" * 30)
-    
-    # Product count by category
-    product_categories = run_query("""
-        SELECT category, COUNT(*) as product_count
-        FROM products GROUP BY category ORDER BY product_count DESC
-    """)
-    
     report_lines.append("Product Categories:")
-    for _, row in product_categories.iterrows():
-        report_lines.append(f"  {row['category']}: {row['product_count']} products")
-    
-    # Top 5 selling products
-    top_products = run_query("""
-        SELECT p.name, p.category, p.price,
-               SUM(oi.quantity) as units_sold,
-               SUM(oi.quantity * oi.price_per_unit) as revenue
-        FROM products p
-        JOIN order_items oi ON p.product_id = oi.product_id
-        GROUP BY p.product_id
-        ORDER BY revenue DESC
-        LIMIT 5
-    """)
-    
-    report_lines.append("\nTop 5 Products by Revenue:")
-    for i, row in top_products.iterrows():
-        report_lines.append(f"  {i+1}. {row['name']} ({row['category']})")
-        report_lines.append(f"     Price: ${row['price']:.2f} | Units Sold: {row['units_sold']:.0f} | Revenue: ${row['revenue']:.2f}")
-    
-    # Sales by category
-    category_sales = run_query("""
-        SELECT p.category, SUM(oi.quantity) as units_sold,
-               SUM(oi.quantity * oi.price_per_unit) as revenue
-        FROM order_items oi
-        JOIN products p ON oi.product_id = p.product_id
-        GROUP BY p.category
-        ORDER BY revenue DESC
-    """)
-    
+    for category, product_count in products["categories"]:
+        report_lines.append(f"  {category}: {product_count} products")
+
+    report_lines.append(f"\nTop {TOP_N} Products by Revenue:")
+    for i, (name, category, price, units_sold, revenue) in enumerate(products["top"]):
+        report_lines.append(f"  {i+1}. {name} ({category})")
+        report_lines.append(f"     Price: ${price:.2f} | Units Sold: {units_sold:.0f} | Revenue: ${revenue:.2f}")
+
     report_lines.append("\nSales by Category:")
-    for _, row in category_sales.iterrows():
-        report_lines.append(f"  {row['category']}: {row['units_sold']:.0f} units, ${row['revenue']:.2f} revenue")
-    
+    for category, units_sold, revenue in products["category_sales"]:
+        report_lines.append(f"  {category}: {units_sold:.0f} units, ${revenue:.2f} revenue")
+
     # 3. Customer Analysis
     report_lines.append("\n\n3. CUSTOMER ANALYSIS")
     report_lines.append("-" * 30)
-    
-    # Total customers
-    customer_count = run_query("SELECT COUNT(*) as count FROM customers")
-    report_lines.append(f"Total Customers: {customer_count['count'].iloc[0]}")
-    
-    # Top customers by spending
-    top_customers = run_query("""
-        SELECT c.first_name || ' ' || c.last_name as customer_name,
-               COUNT(o.order_id) as order_count,
-               SUM(o.total_amount) as total_spent,
-               AVG(o.total_amount) as avg_order_value
-        FROM customers c
-        JOIN orders o ON c.customer_id = o.customer_id
-        GROUP BY c.customer_id
-        ORDER BY total_spent DESC
-        LIMIT 5
-    """)
-    
-    report_lines.append("\nTop 5 Customers by Spending:")
-    for i, row in top_customers.iterrows():
-        report_lines.append(f"  {i+1}. {row['customer_name']}")
-        report_lines.append(f"     Orders: {row['order_count']} | Total Spent: ${row['total_spent']:.2f} | Avg Order: ${row['avg_order_value']:.2f}")
-    
-    # Customer distribution by state
-    customer_states = run_query("""
-        SELECT state, COUNT(*) as customer_count
-        FROM customers
-        GROUP BY state
-        ORDER BY customer_count DESC
-    """)
-    
+    report_lines.append(f"Total Customers: {customers['customer_count']}")
+
+    report_lines.append(f"\nTop {TOP_N} Customers by Spending:")
+    for i, (customer_name, count, total_spent, avg_order_value) in enumerate(customers["top"]):
+        report_lines.append(f"  {i+1}. {customer_name}")
+        report_lines.append(f"     Orders: {count} | Total Spent: ${total_spent:.2f} | Avg Order: ${avg_order_value:.2f}")
+
     report_lines.append("\nCustomer Distribution by State:")
-    for _, row in customer_states.iterrows():
-        report_lines.append(f"  {row['state']}: {row['customer_count']} customers")
-    
+    for state, customer_count in customers["states"]:
+        report_lines.append(f"  {state}: {customer_count} customers")
+
     # 4. Inventory Status
     report_lines.append("\n\n4. INVENTORY STATUS")
     report_lines.append("-" * 30)
-    
-    # Inventory overview
-    inventory = run_query("""
-        SELECT SUM(stock_quantity) as total_units,
-               AVG(stock_quantity) as avg_stock,
-               MIN(stock_quantity) as min_stock,
-               MAX(stock_quantity) as max_stock
-        FROM products
-    """)
-    
-    report_lines.append(f"Total Inventory: {inventory['total_units'].iloc[0]:.0f} units")
-    report_lines.append(f"Average Stock per Product: {inventory['avg_stock'].iloc[0]:.1f} units")
-    report_lines.append(f"Stock Range: {inventory['min_stock'].iloc[0]:.0f} to {inventory['max_stock'].iloc[0]:.0f} units")
-    
-    # Low stock products
-    low_stock = run_query("""
-        SELECT name, category, stock_quantity, price
-        FROM products
-        WHERE stock_quantity < 50
-        ORDER BY stock_quantity ASC
-    """)
-    
-    if not low_stock.empty:
-        report_lines.append("\nLow Stock Products (less than 50 units):")
-        for _, row in low_stock.iterrows():
-            report_lines.append(f"  {row['name']} ({row['category']}): {row['stock_quantity']:.0f} units left | ${row['price']:.2f}")
-    
+    total_units, avg_stock, min_stock, max_stock = products["inventory"]
+    report_lines.append(f"Total Inventory: {total_units:.0f} units")
+    report_lines.append(f"Average Stock per Product: {avg_stock:.1f} units")
+    report_lines.append(f"Stock Range: {min_stock:.0f} to {max_stock:.0f} units")
+
+    if products["low_stock"]:
+        report_lines.append(f"\nLow Stock Products (less than {LOW_STOCK_THRESHOLD} units):")
+        for name, category, stock_quantity, price in products["low_stock"]:
+            report_lines.append(f"  {name} ({category}): {stock_quantity:.0f} units left | ${price:.2f}")
+
     # 5. Payment Method Analysis
     report_lines.append("\n\n5. PAYMENT METHOD ANALYSIS")
     report_lines.append("-" * 30)
-    
-    payment_methods = run_query("""
-        SELECT payment_method, COUNT(*) as order_count, 
-               SUM(total_amount) as total_revenue,
-               AVG(total_amount) as avg_order_value
-        FROM orders
-        GROUP BY payment_method
-        ORDER BY total_revenue DESC
-    """)
-    
     report_lines.append("Payment Method Breakdown:")
-    for _, row in payment_methods.iterrows():
-        percent = (row['order_count'] / total_sales['order_count'].iloc[0]) * 100
-        report_lines.append(f"  {row['payment_method']}: {row['order_count']} orders ({percent:.1f}%)")
-        report_lines.append(f"     Total Revenue: ${row['total_revenue']:.2f} | Avg Order: ${row['avg_order_value']:.2f}")
-    
-    # Close the database connection
-    conn.close()
-    
-    # Combine all lines into a single string
+    for payment_method, count, revenue in orders["payment"]:
+        percent = (count / order_count) * 100
+        report_lines.append(f"  {payment_method}: {count} orders ({percent:.1f}%)")
+        report_lines.append(f"     Total Revenue: ${revenue:.2f} | Avg Order: ${revenue / count:.2f}")
+
     return "\n".join(report_lines)
 
+
+def report_dataframes(data):
+    """compute_report_data() output as pandas DataFrames, for notebooks. Requires pandas."""
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("report_dataframes needs pandas; the text report does not") from None
+    return {
+        "order_status": pd.DataFrame(data["orders"]["status"],
+                                     columns=["status", "order_count", "total_amount", "avg_amount"]),
+        "payment_methods": pd.DataFrame(data["orders"]["payment"],
+                                        columns=["payment_method", "order_count", "total_revenue"]),
+        "top_products": pd.DataFrame(data["products"]["top"],
+                                     columns=["name", "category", "price", "units_sold", "revenue"]),
+        "category_sales": pd.DataFrame(data["products"]["category_sales"],
+                                       columns=["category", "units_sold", "revenue"]),
+        "low_stock": pd.DataFrame(data["products"]["low_stock"],
+                                  columns=["name", "category", "stock_quantity", "price"]),
+        "top_customers": pd.DataFrame(data["customers"]["top"],
+                                      columns=["customer_name", "order_count", "total_spent", "avg_order_value"]),
+        "customer_states": pd.DataFrame(data["customers"]["states"], columns=["state", "customer_count"]),
+    }
+
+
+def generate_sales_analysis_report(db_path=None):
+    """
+    Generate a comprehensive sales analysis report from the online sales database
+    (SALES_DB_PATH by default). Returns the report as a formatted text string.
+    """
+    with read_connection(db_path) as conn:
+        data = compute_report_data(conn)
+    return format_report(data)
+
 # Example usage
 if __name__ == "__main__":
     report = generate_sales_analysis_report()
     print(report)
-    
+
     # Optionally save to a file
     with open("sales_analysis_report.txt", "w") as f:
-        f.write(report)
\ No newline at end of file
+        f.write(report)
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from report import REPORT_SECTIONS, compute_report_data, format_report
+from sales_aggregates import aggregates_installed, table_versions
+from sales_db import file_identity, get_pool
+
+
+def _stat_stamp(path):
+    stamp = []
+    for file in (path, f"{path}-wal"):
+        try:
+            st = os.stat(file)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+class ReportCache:
+    """
+    Sales report text cached per database, with every section keyed on the change
+    counters (sales_aggregates.table_versions) of the tables it reads.
+
+    A call when no counter moved returns the cached text, including its original
+    "Generated on" time. Otherwise only the sections whose tables changed are recomputed
+    and the text is re-rendered. Databases without the counters fall back to the file
+    and WAL mtimes, which invalidate every section at once.
+
+    Thread-safe. The lock only guards the cache entries; sections are computed outside
+    it, and concurrent calls that need the same section at the same key share one
+    computation through an in-flight future.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Pool path -> {"sections": {name: (key, data)}, "text": str or None, "text_keys": keys of the text}
+        self._entries = {}
+        # (pool path, section, key) -> Future of the section data being computed
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.sections_recomputed = 0
+        self.sections_reused = 0
+        self.compute_seconds = 0.0
+        self.last_compute_seconds = 0.0
+
+    @staticmethod
+    def _section_keys(conn, path):
+        use_aggregates = aggregates_installed(conn)
+        identity = file_identity(path)
+        versions = table_versions(conn)
+        if versions is None:
+            stamp = _stat_stamp(path)
+            return use_aggregates, {name: (identity, use_aggregates, stamp) for name in REPORT_SECTIONS}
+        return use_aggregates, {
+            name: (identity, use_aggregates, tuple(versions.get(table) for table in tables))
+            for name, (_, tables) in REPORT_SECTIONS.items()
+        }
+
+    def get(self, db_path=None):
+        """The report text for db_path (SALES_DB_PATH by default), recomputing only stale sections."""
+        pool = get_pool(db_path)
+        with pool.connection() as conn:
+            # One read transaction, so the counters and the section data come from the same snapshot
+            conn.execute("BEGIN")
+            try:
+                use_aggregates, keys = self._section_keys(conn, pool.path)
+                with self._lock:
+                    entry = self._entries.setdefault(pool.path, {"sections": {}, "text": None, "text_keys": None})
+                    if entry["text_keys"] == keys:
+                        self.hits += 1
+                        return entry["text"]
+                    self.misses += 1
+                    data, pending, mine = {}, {}, []
+                    for name in REPORT_SECTIONS:
+                        cached = entry["sections"].get(name)
+                        if cached is not None and cached[0] == keys[name]:
+                            data[name] = cached[1]
+                            continue
+                        future = self._in_flight.get((pool.path, name, keys[name]))
+                        if future is None:
+                            future = self._in_flight[(pool.path, name, keys[name])] = Future()
+                            mine.append(name)
+                        pending[name] = future
+
+                if mine:
+                    self._compute(conn, pool.path, use_aggregates, keys, mine, pending)
+            finally:
+                conn.rollback()
+
+        # Sections another call is computing are awaited after the connection is returned
+        for name, future in pending.items():
+            data[name] = future.result()
+        text = format_report({name: data[name] for name in REPORT_SECTIONS})
+        with self._lock:
+            for name in pending:
+                entry["sections"][name] = (keys[name], data[name])
+            entry["text"], entry["text_keys"] = text, keys
+            self.sections_reused += len(REPORT_SECTIONS) - len(mine)
+        return text
+
+    def _compute(self, conn, path, use_aggregates, keys, names, futures):
+        """Compute the named sections and resolve their in-flight futures, with the result or the error."""
+        start = time.perf_counter()
+        try:
+            fresh = compute_report_data(conn, use_aggregates=use_aggregates, sections=names)
+        except BaseException as e:
+            with self._lock:
+                for name in names:
+                    self._in_flight.pop((path, name, keys[name]), None)
+            for name in names:
+                futures[name].set_exception(e)
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            for name in names:
+                self._in_flight.pop((path, name, keys[name]), None)
+            self.last_compute_seconds = elapsed
+            self.compute_seconds += elapsed
+            self.sections_recomputed += len(names)
+        for name in names:
+            futures[name].set_result(fresh[name])
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "sections_recomputed": self.sections_recomputed,
+                "sections_reused": self.sections_reused,
+                "compute_seconds_total": round(self.compute_seconds, 4),
+                "last_compute_seconds": round(self.last_compute_seconds, 4),
+            }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,240 @@
+import hashlib
+import math
+import os
+import pickle
+import re
+import sys
+import tempfile
+from collections import Counter, defaultdict
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RETRIEVAL_INDEX_FILE = "s3_retrieval_index.pkl"
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were which with
+""".split())
+
+
+def tokenize(text):
+    """Lower-case alphanumeric terms with stopwords removed."""
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedder. Unigrams and bigrams are hashed into
+    a fixed number of signed buckets, so it runs offline with no model download.
+    """
+    name = "hashing"
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _bucket(self, feature):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if (value >> 63) & 1 else -1.0
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            terms = tokenize(text)
+            features = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+            for feature in features:
+                col, sign = self._bucket(feature)
+                matrix[row, col] += sign
+        return _normalize_rows(matrix)
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI embeddings endpoint."""
+    name = "openai"
+
+    def __init__(self, model="text-embedding-3-small", batch_size=256, client=None):
+        self.model = model
+        self.batch_size = batch_size
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [t or " " for t in texts[start:start + self.batch_size]]
+            response = self.client.embeddings.create(model=self.model, input=batch)
+            vectors.extend(item.embedding for item in response.data)
+        return _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    OpenAIEmbedder.name: OpenAIEmbedder,
+}
+
+
+def get_embedder(name=None):
+    """
+    Return an embedder instance by name, or None for BM25-only retrieval.
+    Defaults to the RETRIEVAL_EMBEDDER environment variable.
+    """
+    name = name if name is not None else os.getenv("RETRIEVAL_EMBEDDER", "hashing")
+    if not name or name == "none":
+        return None
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder: {name}")
+    return EMBEDDERS[name]()
+
+
+class RetrievalIndex:
+    """
+    BM25 inverted index over chunk summaries, with an optional dense embedding matrix.
+    Built once at index time; queries are scored with vectorized NumPy operations.
+    """
+
+    def __init__(self, docs, postings, doc_len, embeddings=None, embedder_name=None,
+                 fingerprint=None, k1=1.5, b=0.75):
+        self.docs = docs
+        self.postings = postings
+        self.doc_len = doc_len
+        self.embeddings = embeddings
+        self.embedder_name = embedder_name
+        self.fingerprint = fingerprint
+        self.k1 = k1
+        self.b = b
+        n = len(docs)
+        self.avgdl = float(doc_len.mean()) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in postings.items()
+        }
+
+    @classmethod
+    def build(cls, chunks, embedder=None, fingerprint=None, **kwargs):
+        """Build from an iterable of (file, chunk_no, summary), e.g. IndexStore.iter_chunks()."""
+        docs = []
+        term_docs = defaultdict(list)
+        doc_len = []
+        for file, chunk_no, summary in chunks:
+            doc_id = len(docs)
+            docs.append({"file": file, "chunk": chunk_no, "summary": summary})
+            counts = Counter(tokenize(summary))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_docs[term].append((doc_id, tf))
+
+        postings = {
+            term: (np.fromiter((d for d, _ in pairs), dtype=np.int32, count=len(pairs)),
+                   np.fromiter((tf for _, tf in pairs), dtype=np.float32, count=len(pairs)))
+            for term, pairs in term_docs.items()
+        }
+
+        embeddings = None
+        if embedder is not None and docs:
+            embeddings = embedder.embed([d["summary"] or "" for d in docs])
+
+        return cls(
+            docs,
+            postings,
+            np.asarray(doc_len, dtype=np.float32),
+            embeddings=embeddings,
+            embedder_name=getattr(embedder, "name", None),
+            fingerprint=fingerprint,
+            **kwargs,
+        )
+
+    def bm25_scores(self, query):
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        if not self.docs:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / (self.avgdl or 1.0))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tf = self.postings[term]
+            scores[ids] += self.idf[term] * tf * (self.k1 + 1) / (tf + norm[ids])
+        return scores
+
+    def dense_scores(self, query, embedder):
+        return self.embeddings @ embedder.embed([query])[0]
+
+    def search(self, query, top_k=10, embedder=None, alpha=0.5):
+        """
+        Return the top_k documents as (doc, score) pairs. When the index holds
+        embeddings, BM25 and cosine scores are max-normalized and blended by alpha.
+        """
+        if not self.docs:
+            return []
+
+        scores = self.bm25_scores(query)
+        peak = scores.max()
+        if peak > 0:
+            scores = scores / peak
+
+        if self.embeddings is not None:
+            embedder = embedder or get_embedder(self.embedder_name)
+            dense = np.clip(self.dense_scores(query, embedder), 0, None)
+            scores = (1 - alpha) * scores + alpha * dense
+
+        top_k = min(top_k, len(self.docs))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.docs[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def save(self, path=RETRIEVAL_INDEX_FILE):
+        # A temporary file of its own per writer, so concurrent saves never share a file
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                        dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def load(path=RETRIEVAL_INDEX_FILE):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def build_retrieval_index(store, path=RETRIEVAL_INDEX_FILE, embedder_name=None):
+    """Build the retrieval index over every summary in an IndexStore and persist it."""
+    fingerprint = store.version()
+    retrieval_index = RetrievalIndex.build(
+        store.iter_chunks(), embedder=get_embedder(embedder_name), fingerprint=fingerprint)
+    retrieval_index.save(path)
+    return retrieval_index
+
+
+def load_retrieval_index(store, path=RETRIEVAL_INDEX_FILE, rebuild_stale=True):
+    """
+    Load the persisted retrieval index, building it if it is missing or unreadable. An index
+    older than the store is rebuilt too, unless rebuild_stale is False: then it is returned
+    as is and rebuilding is left to the indexer.
+    """
+    if os.path.exists(path):
+        try:
+            retrieval_index = RetrievalIndex.load(path)
+            if not rebuild_stale or retrieval_index.fingerprint == store.version():
+                return retrieval_index
+        except Exception as e:
+            print(f"[Retrieval] Could not load {path}: {e}", file=sys.stderr)
+    return build_retrieval_index(store, path=path)
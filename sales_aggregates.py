@@ -0,0 +1,210 @@
+"""
+Materialized sales aggregates for the online_sales database, kept current by triggers.
+
+    python sales_aggregates.py install [--db online_sales.db]   # create tables + triggers, then rebuild
+    python sales_aggregates.py rebuild [--db online_sales.db]   # recompute from orders / order_items
+    python sales_aggregates.py verify  [--db online_sales.db]   # compare against a full recompute
+
+Each aggregate row is adjusted by the triggers on every insert, update and delete of
+orders and order_items, so reads cost the same however long the order history is.
+A NULL status or payment method is stored under the empty string.
+
+table_versions holds a change counter per source table, bumped by triggers on every
+write, so caches can tell which tables changed without comparing data. (PRAGMA
+data_version cannot serve here: it is only meaningful within a single connection.)
+"""
+import argparse
+import sqlite3
+import sys
+
+DB_PATH = "online_sales.db"
+# Revenue sums drift by float rounding under incremental updates; verify allows this much
+VERIFY_TOLERANCE = 0.01
+
+AGGREGATE_TABLES = """
+CREATE TABLE IF NOT EXISTS agg_product_sales (
+    product_id INTEGER PRIMARY KEY,
+    item_count INTEGER NOT NULL,
+    units_sold INTEGER NOT NULL,
+    revenue REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_customer_spend (
+    customer_id INTEGER PRIMARY KEY,
+    order_count INTEGER NOT NULL,
+    total_spent REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_agg_customer_spend_total ON agg_customer_spend (total_spent);
+CREATE TABLE IF NOT EXISTS agg_payment_method (
+    payment_method TEXT PRIMARY KEY,
+    order_count INTEGER NOT NULL,
+    revenue REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_order_status (
+    status TEXT PRIMARY KEY,
+    order_count INTEGER NOT NULL,
+    revenue REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+VERSIONED_TABLES = ("customers", "products", "orders", "order_items")
+
+# Statements that add (sign = 1) or remove (sign = -1) one order or order item; {row} is NEW or OLD
+_ORDER_DELTA = """
+    INSERT INTO agg_customer_spend (customer_id, order_count, total_spent)
+    VALUES ({row}.customer_id, {sign}, {sign} * IFNULL({row}.total_amount, 0))
+    ON CONFLICT (customer_id) DO UPDATE SET order_count = order_count + excluded.order_count,
+                                            total_spent = total_spent + excluded.total_spent;
+    INSERT INTO agg_payment_method (payment_method, order_count, revenue)
+    VALUES (IFNULL({row}.payment_method, ''), {sign}, {sign} * IFNULL({row}.total_amount, 0))
+    ON CONFLICT (payment_method) DO UPDATE SET order_count = order_count + excluded.order_count,
+                                               revenue = revenue + excluded.revenue;
+    INSERT INTO agg_order_status (status, order_count, revenue)
+    VALUES (IFNULL({row}.status, ''), {sign}, {sign} * IFNULL({row}.total_amount, 0))
+    ON CONFLICT (status) DO UPDATE SET order_count = order_count + excluded.order_count,
+                                       revenue = revenue + excluded.revenue;
+"""
+
+_ORDER_CLEANUP = """
+    DELETE FROM agg_customer_spend WHERE customer_id = OLD.customer_id AND order_count = 0;
+    DELETE FROM agg_payment_method WHERE payment_method = IFNULL(OLD.payment_method, '') AND order_count = 0;
+    DELETE FROM agg_order_status WHERE status = IFNULL(OLD.status, '') AND order_count = 0;
+"""
+
+_ITEM_DELTA = """
+    INSERT INTO agg_product_sales (product_id, item_count, units_sold, revenue)
+    VALUES ({row}.product_id, {sign}, {sign} * {row}.quantity, {sign} * {row}.quantity * {row}.price_per_unit)
+    ON CONFLICT (product_id) DO UPDATE SET item_count = item_count + excluded.item_count,
+                                           units_sold = units_sold + excluded.units_sold,
+                                           revenue = revenue + excluded.revenue;
+"""
+
+_ITEM_CLEANUP = """
+    DELETE FROM agg_product_sales WHERE product_id = OLD.product_id AND item_count = 0;
+"""
+
+
+def _trigger(name, event, table, body):
+    return f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN {body} END;"
+
+
+AGGREGATE_TRIGGERS = "\n".join([
+    _trigger("trg_agg_orders_insert", "INSERT", "orders", _ORDER_DELTA.format(row="NEW", sign=1)),
+    _trigger("trg_agg_orders_delete", "DELETE", "orders",
+             _ORDER_DELTA.format(row="OLD", sign=-1) + _ORDER_CLEANUP),
+    _trigger("trg_agg_orders_update", "UPDATE OF customer_id, total_amount, status, payment_method", "orders",
+             _ORDER_DELTA.format(row="OLD", sign=-1) + _ORDER_DELTA.format(row="NEW", sign=1) + _ORDER_CLEANUP),
+    _trigger("trg_agg_order_items_insert", "INSERT", "order_items", _ITEM_DELTA.format(row="NEW", sign=1)),
+    _trigger("trg_agg_order_items_delete", "DELETE", "order_items",
+             _ITEM_DELTA.format(row="OLD", sign=-1) + _ITEM_CLEANUP),
+    _trigger("trg_agg_order_items_update", "UPDATE OF product_id, quantity, price_per_unit", "order_items",
+             _ITEM_DELTA.format(row="OLD", sign=-1) + _ITEM_DELTA.format(row="NEW", sign=1) + _ITEM_CLEANUP),
+] + [
+    _trigger(f"trg_version_{table}_{event.lower()}", event, table,
+             f"UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';")
+    for table in VERSIONED_TABLES
+    for event in ("INSERT", "UPDATE", "DELETE")
+])
+
+# Full recomputes, shared by rebuild and verify: (aggregate table, key column, columns, SELECT)
+RECOMPUTE = [
+    ("agg_product_sales", "product_id", ("item_count", "units_sold", "revenue"), """
+        SELECT product_id, COUNT(*), SUM(quantity), SUM(quantity * price_per_unit)
+        FROM order_items GROUP BY product_id"""),
+    ("agg_customer_spend", "customer_id", ("order_count", "total_spent"), """
+        SELECT customer_id, COUNT(*), SUM(IFNULL(total_amount, 0))
+        FROM orders GROUP BY customer_id"""),
+    ("agg_payment_method", "payment_method", ("order_count", "revenue"), """
+        SELECT IFNULL(payment_method, ''), COUNT(*), SUM(IFNULL(total_amount, 0))
+        FROM orders GROUP BY IFNULL(payment_method, '')"""),
+    ("agg_order_status", "status", ("order_count", "revenue"), """
+        SELECT IFNULL(status, ''), COUNT(*), SUM(IFNULL(total_amount, 0))
+        FROM orders GROUP BY IFNULL(status, '')"""),
+]
+
+
+def aggregates_installed(conn):
+    """True when every aggregate table exists in the database behind conn."""
+    names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return all(table in names for table, _, _, _ in RECOMPUTE)
+
+
+def table_versions(conn):
+    """{table: change counter} for the source tables, or None when the counters are not installed."""
+    try:
+        return dict(conn.execute("SELECT table_name, version FROM table_versions"))
+    except sqlite3.OperationalError:
+        return None
+
+
+def rebuild_aggregates(conn):
+    """Recompute every aggregate table from orders and order_items in one transaction."""
+    with conn:
+        for table, key, columns, select in RECOMPUTE:
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"INSERT INTO {table} ({key}, {', '.join(columns)}) {select}")
+        # Readers cached on the old aggregate values must recompute
+        if table_versions(conn) is not None:
+            conn.execute("UPDATE table_versions SET version = version + 1")
+
+
+def install_aggregates(conn, rebuild=True):
+    """Create the aggregate tables and their triggers, then fill them from the current data."""
+    with conn:
+        conn.executescript(AGGREGATE_TABLES)
+        conn.executescript(AGGREGATE_TRIGGERS)
+        conn.executemany("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)",
+                         [(table,) for table in VERSIONED_TABLES])
+    if rebuild:
+        rebuild_aggregates(conn)
+
+
+def verify_aggregates(conn, tolerance=VERIFY_TOLERANCE):
+    """Compare each aggregate table with a full recompute. Returns a list of mismatch descriptions."""
+    problems = []
+    for table, key, columns, select in RECOMPUTE:
+        expected = {row[0]: row[1:] for row in conn.execute(select)}
+        stored = {row[0]: row[1:] for row in conn.execute(f"SELECT {key}, {', '.join(columns)} FROM {table}")}
+        for missing in expected.keys() - stored.keys():
+            problems.append(f"{table}: missing {key}={missing!r}")
+        for extra in stored.keys() - expected.keys():
+            problems.append(f"{table}: unexpected {key}={extra!r}")
+        for k in expected.keys() & stored.keys():
+            for column, want, got in zip(columns, expected[k], stored[k]):
+                if abs((want or 0) - (got or 0)) > tolerance:
+                    problems.append(f"{table}: {key}={k!r} {column} is {got}, expected {want}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["install", "rebuild", "verify"])
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command != "install" and not aggregates_installed(conn):
+            print(f"[Aggregates] Not installed in {args.db}; run the install command first")
+            sys.exit(1)
+        if args.command == "install":
+            install_aggregates(conn)
+            print(f"[Aggregates] Installed and rebuilt in {args.db}")
+        elif args.command == "rebuild":
+            rebuild_aggregates(conn)
+            print(f"[Aggregates] Rebuilt in {args.db}")
+        else:
+            problems = verify_aggregates(conn)
+            for problem in problems:
+                print(f"[Aggregates] {problem}")
+            print(f"[Aggregates] {'OK' if not problems else f'{len(problems)} mismatch(es)'}")
+            sys.exit(1 if problems else 0)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Shared read access to the online_sales database for the report and data display tools.
+
+Connections are opened read-only (mode=ro URI with query_only), tuned for reads
+(mmap, a larger page cache, a prepared statement cache) and kept in a pool, so tool
+calls on executor threads borrow a warm connection instead of connecting every time.
+The database is switched to WAL when the pool is created (and when the file is
+replaced), so readers do not block on a writer.
+"""
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SALES_DB_PATH = os.getenv("SALES_DB_PATH", "online_sales.db")
+POOL_SIZE = int(os.getenv("SALES_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("SALES_DB_POOL_TIMEOUT", "30"))
+MMAP_SIZE = int(os.getenv("SALES_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE_KB = int(os.getenv("SALES_DB_CACHE_KB", "65536"))
+CACHED_STATEMENTS = int(os.getenv("SALES_DB_CACHED_STATEMENTS", "256"))
+
+
+def file_identity(path):
+    """(device, inode) of a file, which changes when the file is replaced."""
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino
+
+
+class ReadPool:
+    """
+    Bounded pool of read-only connections to one database file.
+
+    Connections are created on demand up to `size`; a borrower waits for a free one
+    after that. If the file is replaced (a regenerated database), idle connections to
+    the old file are closed and new ones are opened on the next borrow.
+    """
+
+    def __init__(self, path=SALES_DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = str(Path(path).resolve())
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._file_id = None
+        enable_wal(self.path)
+
+    def _connect(self):
+        conn = sqlite3.connect(Path(self.path).as_uri() + "?mode=ro", uri=True, check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS, timeout=self.timeout)
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _check_file(self):
+        file_id = file_identity(self.path)
+        with self._lock:
+            replaced = self._file_id is not None and file_id != self._file_id
+            if replaced:
+                self._close_idle()
+            self._file_id = file_id
+        if replaced:
+            enable_wal(self.path)
+
+    def _close_idle(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            self._created -= 1
+
+    def _acquire(self):
+        self._check_file()
+        try:
+            conn, file_id = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    return self._connect(), self._file_id
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                conn, file_id = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise RuntimeError(f"No database connection free after {self.timeout}s ({self.size} in use)")
+        if file_id != self._file_id:
+            # Borrowed while the file was being replaced; open a fresh one in its place
+            conn.close()
+            return self._connect(), self._file_id
+        return conn, file_id
+
+    @contextmanager
+    def connection(self):
+        """Borrow a read-only connection for the duration of the with block."""
+        conn, file_id = self._acquire()
+        reusable = True
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            # A connection that hit a database error is not reused
+            reusable = False
+            raise
+        finally:
+            if reusable:
+                self._idle.put((conn, file_id))
+            else:
+                conn.close()
+                with self._lock:
+                    self._created -= 1
+
+    def close(self):
+        with self._lock:
+            self._close_idle()
+
+
+def enable_wal(path):
+    """Switch the database to WAL so pooled readers and a writer do not block each other."""
+    if not os.path.exists(path):
+        return
+    try:
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # Read-only files and busy writers keep their journal mode; reads still work
+        print(f"[Sales DB] Could not enable WAL on {path}: {e}", file=sys.stderr)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    """The process-wide pool for a database path (SALES_DB_PATH by default)."""
+    key = str(Path(path or SALES_DB_PATH).resolve())
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ReadPool(key)
+        return _pools[key]
+
+
+def read_connection(path=None):
+    """Context manager borrowing a pooled read-only connection."""
+    return get_pool(path).connection()
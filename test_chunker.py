@@ -0,0 +1,109 @@
+"""
+Tests for chunker: chunk_stream over pieces (e.g. PDF pages) must give exactly the chunks
+chunk_document gives for the joined text, so chunk hashes and summaries do not depend on
+how a document was read.
+
+    python -m pytest -q test_chunker.py
+
+The encodings are built offline from the real cl100k/o200k pre-tokenizer patterns and a
+small merge table, so no tiktoken download is needed.
+"""
+import random
+from unittest import mock
+
+import pytest
+import tiktoken
+import tiktoken_ext.openai_public as openai_public
+
+from chunker import chunk_document, chunk_stream
+
+# Merges that cross punctuation, line breaks and slashes, where the patterns differ
+MERGES = [b".\n", b"\n/", b".\n/", b":\n", b"\n\n", b"in", b"ing", b"th", b"the", b" the", b"er",
+          b"/u", b"/us", b"/usr", b"\xc3\xa9", b"12", b"123"]
+
+LINES = [
+    "The engine failed on approach.", "/usr/bin/report --all", "See figure 3:", "/var/log/incident",
+    "- checklist item", "12345 feet", "\"quoted\" line.", "", "   indented text", "café résumé naïve",
+    "Emoji 👍 in the log!", "(note)", "/", "Sentence one. Sentence two?",
+]
+
+
+@pytest.fixture(scope="module", params=["cl100k_base", "o200k_base"])
+def tokenizer(request):
+    with mock.patch.object(openai_public, "load_tiktoken_bpe", lambda *args, **kwargs: {}):
+        pat_str = getattr(openai_public, request.param)()["pat_str"]
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in MERGES:
+        ranks[merge] = len(ranks)
+    return tiktoken.Encoding(name=f"test_{request.param}", pat_str=pat_str, mergeable_ranks=ranks,
+                             special_tokens={})
+
+
+def sample_text(seed, lines=2000):
+    rng = random.Random(seed)
+    return "\n".join(rng.choice(LINES) for _ in range(lines)) + "\n"
+
+
+def random_pieces(text, seed, max_piece=200):
+    rng = random.Random(seed)
+    pieces, start = [], 0
+    while start < len(text):
+        end = start + rng.randint(1, max_piece)
+        pieces.append(text[start:end])
+        start = end
+    return pieces
+
+
+@pytest.mark.parametrize("max_tokens,overlap", [(16, 0), (64, 8), (500, 0), (500, 50)])
+@pytest.mark.parametrize("snap", ["none", "sentence", "paragraph"])
+def test_stream_matches_document(tokenizer, max_tokens, overlap, snap):
+    text = sample_text(seed=max_tokens + overlap)
+    expected = chunk_document(text, max_tokens=max_tokens, overlap=overlap, snap=snap, tokenizer=tokenizer)
+    for seed in range(3):
+        pieces = random_pieces(text, seed)
+        assert list(chunk_stream(pieces, max_tokens=max_tokens, overlap=overlap, snap=snap,
+                                 tokenizer=tokenizer)) == expected
+
+
+def test_stream_matches_document_after_punctuation_and_line_break(tokenizer):
+    # Lines starting with "/" after a line ending in punctuation: o200k keeps ".\n/" together
+    pages = [f"Step {i}.\n/usr/bin/run --step {i}:\n/var/log/step{i}.\n" for i in range(300)]
+    text = "".join(pages)
+    expected = chunk_document(text, max_tokens=40, overlap=0, snap="sentence", tokenizer=tokenizer)
+    assert list(chunk_stream(pages, max_tokens=40, overlap=0, snap="sentence", tokenizer=tokenizer)) == expected
+
+
+def test_stream_of_nothing(tokenizer):
+    assert list(chunk_stream([], tokenizer=tokenizer)) == []
+    assert list(chunk_stream(["", ""], tokenizer=tokenizer)) == chunk_document("", tokenizer=tokenizer)
+
+
+@pytest.mark.parametrize("max_tokens", [4, 7, 33])
+def test_windows_keep_multibyte_characters(tokenizer, max_tokens):
+    # With byte-level tokens most windows would otherwise end inside a character
+    text = "".join(random.Random(max_tokens).choice("aé中文😀 \n.") for _ in range(3000))
+    chunks = chunk_document(text, max_tokens=max_tokens, overlap=0, snap="none", tokenizer=tokenizer)
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert all(chunk.token_count <= max_tokens for chunk in chunks)
+
+
+@pytest.mark.parametrize("pending_limit", [200, 1000, 5000])
+def test_stream_without_line_breaks_stays_bounded(tokenizer, pending_limit):
+    # No line break before a letter or digit, as in a table extracted as one long line
+    rng = random.Random(pending_limit)
+    text = "".join(rng.choice(["12345", " ", "  ", "abc", "Def", ".", "\n ", "\n\n.", "é", "/usr", ",\t", "'s"])
+                   for _ in range(20000))
+    expected = chunk_document(text, max_tokens=64, overlap=8, snap="sentence", tokenizer=tokenizer)
+    pieces = random_pieces(text, seed=pending_limit)
+    consumed = []
+
+    def reading():
+        for piece in pieces:
+            consumed.append(piece)
+            yield piece
+
+    stream = chunk_stream(reading(), max_tokens=64, overlap=8, snap="sentence", tokenizer=tokenizer,
+                          pending_limit=pending_limit)
+    first = next(stream)
+    assert len(consumed) < len(pieces) // 2
+    assert [first, *stream] == expected
@@ -0,0 +1,147 @@
+"""
+Declarative tool registry for MCP servers.
+
+Each tool is declared once as a ToolSpec: its name, description and input schema, its
+handler and how to run it (sync on the thread pool or async on the event loop, its
+concurrency limit, timeout and result caching). The registry builds the types.Tool list
+once at registration, so list_tools returns a prebuilt list, and call_tool dispatches with
+a dict lookup instead of a chain of name comparisons.
+"""
+import asyncio
+import json
+import time
+from typing import Callable, NamedTuple, Optional
+
+import mcp.types as types
+
+NO_ARGUMENTS = {"type": "object", "properties": {}, "required": []}
+
+
+class ToolSpec(NamedTuple):
+    """
+    handler(arguments) returns the text of the tool result; with progress=True it is called
+    as handler(arguments, progress), where progress(done, total) reports to the client (or
+    is None when the client sent no progress token). Synchronous handlers run on the
+    registry's executor; is_async handlers are awaited on the event loop. cache_ttl > 0
+    makes the tool cacheable: a result is reused for identical arguments for that many
+    seconds. warm_modules names the modules the handler imports on first use, so a server
+    can import them ahead of the first call.
+    """
+    name: str
+    description: str
+    handler: Callable
+    input_schema: dict = NO_ARGUMENTS
+    is_async: bool = False
+    concurrency: int = 4
+    timeout: Optional[float] = None
+    cache_ttl: float = 0
+    progress: bool = False
+    warm_modules: tuple = ()
+
+
+class ToolRegistry:
+    """Tool declarations of one server, with their concurrency limits and cached results."""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._specs = {}
+        self._limits = {}
+        self._tools = []
+        # (tool name, canonical arguments) -> (expiry on the monotonic clock, content)
+        self._results = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.timeouts = 0
+
+    def register(self, *specs):
+        for spec in specs:
+            if spec.name in self._specs:
+                raise ValueError(f"Tool already registered: {spec.name}")
+            self._specs[spec.name] = spec
+            self._limits[spec.name] = asyncio.Semaphore(spec.concurrency)
+        self._tools = [
+            types.Tool(name=spec.name, description=spec.description, inputSchema=spec.input_schema)
+            for spec in self._specs.values()
+        ]
+
+    @property
+    def tools(self):
+        """The types.Tool list for list_tools, in registration order."""
+        return self._tools
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def warm_modules(self):
+        """warm_modules of the registered tools, without repeats, in registration order."""
+        return list(dict.fromkeys(module for spec in self._specs.values() for module in spec.warm_modules))
+
+    async def call(self, name, arguments, progress=None):
+        """
+        Run a tool and return its content list. progress is a zero-argument factory for the
+        request's async progress callback, only invoked for tools declared with progress=True.
+        """
+        spec = self._specs.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown tool: {name}")
+        arguments = arguments or {}
+
+        key = None
+        if spec.cache_ttl > 0:
+            key = (name, json.dumps(arguments, sort_keys=True, default=str))
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self.cache_hits += 1
+                return cached[1]
+            self.cache_misses += 1
+
+        report = progress() if spec.progress and progress is not None else None
+        limit = self._limits[name]
+        await limit.acquire()
+        try:
+            running = self._start(spec, arguments, report, limit.release)
+        except BaseException:
+            limit.release()
+            raise
+        try:
+            text = await asyncio.wait_for(running, spec.timeout)
+        except asyncio.TimeoutError:
+            # A synchronous handler keeps running on its worker thread, and keeps its permit;
+            # only the wait ends
+            self.timeouts += 1
+            raise TimeoutError(f"{name} did not finish within {spec.timeout:g}s")
+
+        content = [types.TextContent(type="text", text=text)]
+        if key is not None:
+            now = time.monotonic()
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+            self._results[key] = (now + spec.cache_ttl, content)
+        return content
+
+    def _start(self, spec, arguments, report, release):
+        """
+        Start the handler and return an awaitable for its text. release() is called on the
+        event loop once the handler has actually finished, so the tool's concurrency limit
+        also counts timed-out synchronous handlers still running on the executor.
+        """
+        args = (arguments, report) if spec.progress else (arguments,)
+        if spec.is_async:
+            task = asyncio.ensure_future(spec.handler(*args))
+            task.add_done_callback(lambda _: release())
+            return task
+        loop = asyncio.get_running_loop()
+        if report is not None:
+            # Worker threads report through the event loop that owns the session
+            args = (arguments, lambda done, total=None: asyncio.run_coroutine_threadsafe(report(done, total), loop))
+        job = self.executor.submit(spec.handler, *args)
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(release))
+        return asyncio.wrap_future(job)
+
+    def stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "result_cache_hits": self.cache_hits,
+            "result_cache_misses": self.cache_misses,
+            "result_cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "timeouts": self.timeouts,
+        }